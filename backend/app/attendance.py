@@ -0,0 +1,115 @@
+"""
+Escritura agrupada de asistencias (group commit).
+
+Cada check-in encola su fila y espera a que quede confirmada. Un único task
+inserta todo lo encolado con un executemany en una sola transacción: sin carga
+cada check-in se escribe solo, y en horas pico los que llegan mientras se
+confirma un lote salen juntos en el siguiente, así el costo de commit (fsync)
+se reparte entre todos en lugar de pagarse por check-in. Si el lote falla se
+reintenta fila por fila, así solo falla el check-in con la fila inválida.
+"""
+from sqlalchemy import insert
+from typing import List, Optional, Tuple
+from app.database import async_engine
+from app import models
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_BATCH_SIZE = int(os.getenv("ATTENDANCE_BATCH_SIZE", "500"))
+
+attendance = models.Attendance.__table__
+
+async def insert_attendance(rows: List[dict]):
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(attendance), rows)
+
+class AttendanceWriter:
+    """Agrupa las inserciones de asistencia concurrentes en un solo commit"""
+
+    def __init__(self, batch_size: int = ATTENDANCE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Confirmar lo pendiente y detener el task"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        while self._pending:
+            await self._flush()
+
+    async def record(self, row: dict):
+        """Registrar una asistencia y esperar a que quede confirmada"""
+        if self._task is None:
+            # Sin el task (scripts, workers sin startup): inserción directa
+            await insert_attendance([row])
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        self._wakeup.set()
+        await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                await self._flush()
+
+    async def _flush(self):
+        batch = self._pending[:self.batch_size]
+        self._pending = self._pending[self.batch_size:]
+        try:
+            await insert_attendance([row for row, _ in batch])
+        except asyncio.CancelledError:
+            # Apagado a mitad del lote: stop() lo vuelve a intentar
+            self._pending[:0] = batch
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Attendance insert failed: {e}")
+                _resolve(batch[0][1], e)
+                return
+            # Una fila inválida no debe hacer fallar al resto: reintentar fila por fila
+            logger.warning(f"Attendance batch insert failed ({len(batch)} rows), retrying row by row: {e}")
+            await self._insert_each(batch)
+            return
+        for _, future in batch:
+            _resolve(future)
+
+    async def _insert_each(self, batch: List[Tuple[dict, asyncio.Future]]):
+        for position, (row, future) in enumerate(batch):
+            try:
+                await insert_attendance([row])
+            except asyncio.CancelledError:
+                self._pending[:0] = batch[position:]
+                raise
+            except Exception as e:
+                logger.error(f"Attendance insert failed for member {row.get('member_id')}: {e}")
+                _resolve(future, e)
+                continue
+            _resolve(future)
+
+def _resolve(future: asyncio.Future, error: Optional[Exception] = None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(None)
+
+attendance_writer = AttendanceWriter()
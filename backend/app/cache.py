@@ -0,0 +1,53 @@
+"""
+Cachés en memoria del proceso.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app import metrics
+import threading
+import time
+
+class TTLCache:
+    """Caché LRU acotado con expiración por entrada"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Obtener un valor vigente o None (registra acierto/fallo en las métricas)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        metrics.record_cache(self.name, entry is not None)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guardar un valor; ttl permite acortar la vigencia de una entrada puntual"""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + min(self.ttl, ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,39 +1,385 @@
-from sqlalchemy import create_engine
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
 from dotenv import load_dotenv
+import heapq
+import logging
 import os
+import threading
+import time
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuración de base de datos
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Réplica de lectura opcional (mismo esquema, alimentada por replicación)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# Segundos durante los cuales un usuario que escribió lee siempre del primario
+READ_STICKINESS_SECONDS = float(os.getenv("DATABASE_READ_STICKINESS_SECONDS", "5"))
+
+# Umbral (ms) a partir del cual una sentencia se registra en el log de consultas lentas
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Si está activo, superar el presupuesto de consultas de una ruta es un error (tests/CI)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+# Perfil de SQLite: "production" (pool + WAL) o "legacy" (sin pool, journal por defecto)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production").lower()
+
+# El pool se dimensiona según la cantidad de workers que atienden requests en paralelo
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", os.getenv("WEB_CONCURRENCY", "5")))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(DB_POOL_SIZE)))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMAs aplicados a cada conexión SQLite nueva (perfil "production")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "20000")),  # milisegundos
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negativo = KiB (64 MiB)
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),  # 256 MiB
+    "temp_store": "MEMORY",
+}
+
+def _is_memory_sqlite(url: str) -> bool:
+    """Indica si la URL apunta a una base SQLite en memoria"""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Aplicar los PRAGMAs de rendimiento a una conexión SQLite recién abierta"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+def create_sqlite_engine(url: str, profile: str = SQLITE_PROFILE):
+    """Crear engine SQLite según el perfil configurado"""
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000
+    }
+
+    if _is_memory_sqlite(url):
+        # Una única conexión compartida para que todos vean la misma base en memoria
+        return create_engine(url, connect_args=connect_args, poolclass=StaticPool, echo=False)
+
+    if profile == "legacy":
+        # Sin pool: una conexión nueva por request (comportamiento original)
+        return create_engine(url, connect_args=connect_args, poolclass=NullPool, echo=False)
+
+    sqlite_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=False,
+        echo=False
+    )
+    event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
+    return sqlite_engine
+
+def to_async_url(url: str) -> str:
+    """Convertir una URL síncrona al driver async equivalente (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+psycopg2:"):
+        return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgres:"):
+        return url.replace("postgres:", "postgresql+asyncpg:", 1)
+    return url
+
+def create_async_sqlite_engine(url: str, profile: str = SQLITE_PROFILE):
+    """Crear engine async (aiosqlite) con el mismo perfil que el engine síncrono"""
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000
+    }
+
+    if _is_memory_sqlite(url):
+        return create_async_engine(url, connect_args=connect_args, poolclass=StaticPool, echo=False)
+
+    if profile == "legacy":
+        return create_async_engine(url, connect_args=connect_args, poolclass=NullPool, echo=False)
+
+    sqlite_engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        echo=False
+    )
+    event.listen(sqlite_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return sqlite_engine
+
+def create_async_db_engine(url: str):
+    """Crear engine async para una URL (SQLite con perfil o PostgreSQL con pool)"""
+    if url.startswith("sqlite"):
+        return create_async_sqlite_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True
+    )
+
 if not DATABASE_URL:
     # Usar SQLite para desarrollo con configuración especial para FastAPI
     DATABASE_URL = "sqlite:///./gym_db.db"
-    # Configuración especial para SQLite con FastAPI async
+
+# URL async: se deriva de DATABASE_URL salvo que se indique explícitamente
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_sqlite_engine(DATABASE_URL)
+else:
+    # PostgreSQL para producción
     engine = create_engine(
         DATABASE_URL,
-        connect_args={
-            "check_same_thread": False,
-            "timeout": 20
-        },
-        poolclass=NullPool,  # Sin pool para evitar problemas de threads
-        echo=False
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True
     )
+
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+
+# Sin réplica configurada las lecturas usan el mismo engine que las escrituras
+if DATABASE_READ_URL:
+    read_async_engine = create_async_db_engine(to_async_url(DATABASE_READ_URL))
 else:
-    # PostgreSQL para producción
-    engine = create_engine(DATABASE_URL)
+    read_async_engine = async_engine
+
+# ====== INSTRUMENTACIÓN SQL ======
+
+class QueryBudgetExceeded(RuntimeError):
+    """Una ruta ejecutó más sentencias SQL que su presupuesto"""
 
+class QueryStats:
+    """Estadísticas de SQL acumuladas durante un request"""
+
+    MAX_SLOWEST = 3
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # min-heap (duración, sentencia)
+        self.budget: Optional[int] = None
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if len(self.slowest) < self.MAX_SLOWEST:
+            heapq.heappush(self.slowest, (elapsed_ms, statement))
+        elif elapsed_ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed_ms, statement))
+
+    def slowest_statements(self) -> List[Tuple[float, str]]:
+        return sorted(self.slowest, reverse=True)
+
+    def server_timing(self) -> str:
+        """Valor para el header Server-Timing"""
+        timing = f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+        if self.slowest:
+            timing += f", db-slowest;dur={max(self.slowest)[0]:.1f}"
+        return timing
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def start_query_stats() -> QueryStats:
+    """Comenzar a acumular estadísticas SQL para el contexto (request) actual"""
+    stats = QueryStats()
+    _query_stats.set(stats)
+    return stats
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+def query_budget(max_queries: int):
+    """
+    Dependencia que fija el máximo de sentencias SQL permitido para una ruta.
+
+    El presupuesto cuenta todas las sentencias del request, incluida la consulta
+    del usuario que hace get_current_user cuando no está en la caché de auth:
+    cada ruta autenticada reserva 1 para ella además de sus propias consultas.
+    """
+    async def set_budget():
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+    return set_budget
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed_ms, " ".join(statement.split())[:1000])
+
+def instrument_engine(sync_engine):
+    """Registrar los hooks de medición en un engine (síncrono o sync_engine de uno async)"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if read_async_engine is not async_engine:
+    instrument_engine(read_async_engine.sync_engine)
+
+class PrimarySession(Session):
+    """Sesión sobre el primario que registra si el request escribió datos"""
+
+@event.listens_for(PrimarySession, "after_flush")
+def _track_writes(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _track_dml(orm_execute_state):
+    # INSERT/UPDATE/DELETE ejecutados con session.execute() no pasan por el flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+@event.listens_for(PrimarySession, "after_commit")
+def _mark_recent_write(session):
+    if session.info.pop("has_writes", False):
+        mark_recent_write(session.info.get("client_key"))
+
+# Sesiones síncronas: scripts de mantenimiento y migraciones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sesiones async: usadas por la API
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Sesiones async de solo lectura sobre la réplica
+ReadSessionLocal = sessionmaker(
+    bind=read_async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def create_missing_indexes(bind):
+    """Crear los índices declarados en los modelos que falten en tablas ya existentes"""
+    # create_all() no agrega índices nuevos a tablas que ya existen
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except exc.SQLAlchemyError as e:
+                # Por ejemplo un índice único sobre datos heredados con duplicados
+                logger.warning(f"Could not create index {index.name}: {e}")
+
+# Última escritura por usuario (ordenado por antigüedad) para read-your-writes en este worker
+_recent_writes: "OrderedDict[str, float]" = OrderedDict()
+_recent_writes_lock = threading.Lock()
+
+# Cookie con la hora (epoch) de la última escritura: la respeta cualquier worker
+LAST_WRITE_COOKIE = "gym_last_write"
+
+class RequestWrites:
+    """Escrituras confirmadas durante el request actual (para emitir el cookie)"""
+
+    def __init__(self):
+        self.last_write_at: Optional[float] = None
+
+_request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+def start_request_writes() -> RequestWrites:
+    """Comenzar a registrar las escrituras del contexto (request) actual"""
+    writes = RequestWrites()
+    _request_writes.set(writes)
+    return writes
+
+def client_key(request: Request) -> Optional[str]:
+    """Identificar al usuario del request por el `sub` de su token de acceso"""
+    authorization = request.headers.get("authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        # Sin verificar la firma: la clave solo decide de qué base se lee, y
+        # get_current_user valida el token en el mismo request
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+def mark_recent_write(key: Optional[str]):
+    """Registrar que el usuario escribió, para leer del primario por un tiempo"""
+    if not key or read_async_engine is async_engine:
+        return
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.last_write_at = time.time()
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[key] = now
+        _recent_writes.move_to_end(key)
+        # Descartar entradas vencidas (las más antiguas están al principio)
+        while _recent_writes:
+            oldest_key, written_at = next(iter(_recent_writes.items()))
+            if now - written_at <= READ_STICKINESS_SECONDS:
+                break
+            del _recent_writes[oldest_key]
+
+def has_recent_write(key: Optional[str]) -> bool:
+    """Indica si el usuario escribió en este worker dentro de la ventana de stickiness"""
+    if not key:
+        return False
+    written_at = _recent_writes.get(key)
+    return written_at is not None and time.monotonic() - written_at <= READ_STICKINESS_SECONDS
+
+def wrote_recently(request: Request) -> bool:
+    """Indica si el cookie del cliente registra una escritura dentro de la ventana (en cualquier worker)"""
     try:
+        written_at = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return 0 <= time.time() - written_at <= READ_STICKINESS_SECONDS
+
+async def get_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        db.info["client_key"] = client_key(request)
+        yield db
+
+async def get_read_db(request: Request):
+    """Sesión para endpoints de solo lectura: réplica, o primario si el usuario escribió recién"""
+    key = client_key(request)
+    sticky = has_recent_write(key) or wrote_recently(request)
+    session_factory = AsyncSessionLocal if sticky else ReadSessionLocal
+    async with session_factory() as db:
+        db.info["client_key"] = key
         yield db
-    finally:
-        db.close()
\ No newline at end of file
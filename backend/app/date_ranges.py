@@ -0,0 +1,59 @@
+"""
+Rangos de fechas semiabiertos [inicio, fin) para filtrar columnas DateTime.
+
+Comparar la columna directamente contra los límites (en lugar de envolverla en
+`func.date` o `extract`) permite usar sus índices en SQLite y Postgres.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_
+from typing import List, Tuple
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+def day_range(day: date) -> Tuple[datetime, datetime]:
+    """[00:00 del día, 00:00 del día siguiente)"""
+    start = day_start(day)
+    return start, start + timedelta(days=1)
+
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """[día 1 del mes, día 1 del mes siguiente)"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def month_dates(year: int, month: int) -> Tuple[date, date]:
+    """[día 1 del mes, día 1 del mes siguiente) como fechas, para columnas Date"""
+    start, end = month_range(year, month)
+    return start.date(), end.date()
+
+def within(column, bounds: Tuple[datetime, datetime]):
+    """column >= inicio AND column < fin"""
+    start, end = bounds
+    return and_(column >= start, column < end)
+
+GRANULARITIES = ("day", "week", "month")
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Inicio del período que contiene a `day` (semanas ISO, desde el lunes)"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start + timedelta(days=1)
+
+def buckets(start: date, end: date, granularity: str) -> List[date]:
+    """Inicios de todos los períodos entre start y end (inclusive)"""
+    current = bucket_start(start, granularity)
+    result = []
+    while current <= end:
+        result.append(current)
+        current = next_bucket(current, granularity)
+    return result
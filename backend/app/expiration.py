@@ -0,0 +1,80 @@
+"""
+Vencimiento de membresías.
+
+Un job periódico desactiva con un único UPDATE set-based a los socios activos
+cuya membresía venció; el filtro usa el índice (is_active, membership_end_date),
+así el costo no depende de la cantidad total de socios (ni de los ya vencidos)
+sino de los que vencen.
+Cada ejecución publica filas afectadas y duración en /metrics.
+
+El loop está deshabilitado por defecto y se activa con
+MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS > 0: los pagos no extienden
+`membership_end_date`, así que encenderlo sobre datos existentes desactiva a todos
+los socios con la fecha de fin vencida. Con varios workers cada uno corre el job:
+el UPDATE es idempotente, así que a lo sumo alguno no encuentra filas. También se
+puede correr `expire_memberships.py` por cron.
+"""
+from datetime import date, timedelta
+from sqlalchemy import update
+from typing import Optional
+from app.database import async_engine
+from app import metrics, models
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS = int(os.getenv("MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS", "0"))
+# Días de tolerancia después de membership_end_date antes de desactivar
+MEMBERSHIP_EXPIRATION_GRACE_DAYS = int(os.getenv("MEMBERSHIP_EXPIRATION_GRACE_DAYS", "0"))
+
+JOB_NAME = "membership_expiration"
+
+members = models.Member.__table__
+
+def expiration_cutoff(today: Optional[date] = None) -> date:
+    """Las membresías que terminaron antes de esta fecha se consideran vencidas"""
+    return (today or date.today()) - timedelta(days=MEMBERSHIP_EXPIRATION_GRACE_DAYS)
+
+def expire_statement(cutoff: date):
+    """UPDATE que desactiva a los socios activos vencidos antes de `cutoff`"""
+    return update(members).where(
+        members.c.is_active == True,
+        members.c.membership_end_date < cutoff
+    ).values(is_active=False)
+
+async def expire_memberships(today: Optional[date] = None) -> dict:
+    """Desactivar en una sola sentencia a todos los socios con la membresía vencida"""
+    cutoff = expiration_cutoff(today)
+    start = time.perf_counter()
+    try:
+        async with async_engine.begin() as conn:
+            result = await conn.execute(expire_statement(cutoff))
+    except Exception:
+        metrics.record_job_run(JOB_NAME, time.perf_counter() - start, success=False)
+        raise
+
+    duration = time.perf_counter() - start
+    metrics.record_job_run(JOB_NAME, duration, result.rowcount)
+    logger.info(f"Membership expiration: {result.rowcount} members deactivated in {duration * 1000:.1f}ms")
+    return {
+        "cutoff_date": cutoff,
+        "expired_members": result.rowcount,
+        "duration_ms": round(duration * 1000, 1),
+    }
+
+async def _expiration_loop(interval: int):
+    while True:
+        try:
+            await expire_memberships()
+        except Exception as e:
+            logger.error(f"Membership expiration job failed: {e}")
+        await asyncio.sleep(interval)
+
+def start_expiration_job() -> Optional[asyncio.Task]:
+    """Lanzar el job periódico en el event loop (None si está deshabilitado)"""
+    if MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(_expiration_loop(MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS))
@@ -0,0 +1,57 @@
+"""
+Proyección de columnas (sparse fieldsets) para listados: `fields=id,first_name`.
+
+Con `fields` el endpoint selecciona solo esas columnas (Core select, sin objetos
+ORM) y serializa las filas directamente, sin validar el response_model completo.
+Los campos disponibles salen del schema de respuesta, así una proyección nunca
+expone columnas que el listado normal no devuelve. Los nombres con punto
+(`member.first_name`) se devuelven anidados.
+"""
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Type
+from app.export import json_default
+import json
+
+def schema_columns(schema: Type[BaseModel], model, prefix: str = "") -> Dict[str, object]:
+    """Columnas del modelo que forman parte del schema de respuesta"""
+    table = model.__table__
+    return {f"{prefix}{name}": table.c[name] for name in schema.model_fields if name in table.c}
+
+def parse_fields(fields: Optional[str], available: Dict[str, object]) -> Optional[Dict[str, object]]:
+    """Campos pedidos en orden (None si no se pidió proyección)"""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "fields cannot be empty"
+        )
+    return {name: available[name] for name in names}
+
+def project(query, fields: Dict[str, object], *key_columns):
+    """Reemplazar las columnas del select por las pedidas (+ claves `key_<columna>` para el cursor)"""
+    columns = [column.label(name) for name, column in fields.items()]
+    columns += [column.label(f"key_{column.key}") for column in key_columns]
+    return query.with_only_columns(*columns)
+
+def fields_response(rows: List, fields: Dict[str, object], response: Response) -> Response:
+    """Serializar las filas proyectadas conservando los headers ya fijados (cursor)"""
+    items = []
+    for row in rows:
+        item = {}
+        for name, value in zip(fields, row):
+            target = item
+            *parents, leaf = name.split(".")
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+        items.append(item)
+    return Response(
+        json.dumps(items, default=json_default, ensure_ascii=False),
+        media_type="application/json",
+        # content-length lo calcula la respuesta nueva a partir de su cuerpo
+        headers={name: value for name, value in response.headers.items() if name != "content-length"},
+    )
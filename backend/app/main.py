@@ -1,12 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import members, payments, auth, dashboard, settings, admin
-from app.database import engine
-from app import models
+from fastapi.responses import PlainTextResponse
+from app.routers import members, payments, auth, dashboard, settings, admin, attendance
+from sqlalchemy import text
+from app.database import (
+    engine, async_engine, read_async_engine, create_missing_indexes,
+    start_query_stats, QueryBudgetExceeded, QUERY_BUDGET_STRICT,
+    start_request_writes, LAST_WRITE_COOKIE, READ_STICKINESS_SECONDS
+)
+from app import models, metrics
+from app.security import password_executor
+from app.search import setup_member_search
+from app.revenue_daily import backfill_revenue_daily
+from app.expiration import start_expiration_job
+from app.attendance import attendance_writer
+from app.visit_quota import visit_quota
 import os
+import logging
+import math
+
+logger = logging.getLogger(__name__)
 
 # Crear las tablas en la base de datos
 models.Base.metadata.create_all(bind=engine)
+create_missing_indexes(engine)
+
+# Índice de búsqueda de socios (FTS5 en SQLite, pg_trgm en PostgreSQL)
+setup_member_search(engine)
+
+# Rollup diario de pagos (se construye solo la primera vez)
+backfill_revenue_daily(engine)
 
 app = FastAPI(
     title="Gym Management API",
@@ -30,16 +53,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+@app.middleware("http")
+async def sql_instrumentation(request: Request, call_next):
+    """Medir las sentencias SQL de cada request y exponerlas en headers"""
+    stats = start_query_stats()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = stats.server_timing()
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    
+    if stats.over_budget():
+        message = (
+            f"{request.method} {request.url.path} ejecutó {stats.count} consultas "
+            f"(presupuesto: {stats.budget})"
+        )
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return response
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """Avisar al cliente que escribió para que sus próximas lecturas vayan al primario en cualquier worker"""
+    writes = start_request_writes()
+    response = await call_next(request)
+    if writes.last_write_at is not None:
+        response.set_cookie(
+            LAST_WRITE_COOKIE, f"{writes.last_write_at:.3f}",
+            max_age=math.ceil(READ_STICKINESS_SECONDS), httponly=True, samesite="lax"
+        )
+    return response
+
+# Métricas del pool de conexiones de la API
+metrics.instrument_pool("primary", async_engine.sync_engine)
+if read_async_engine is not async_engine:
+    metrics.instrument_pool("replica", read_async_engine.sync_engine)
+
 # Incluir routers con prefijos
 app.include_router(auth.router, prefix="/api/auth", tags=["🔐 Authentication"])
 app.include_router(members.router, prefix="/api/members", tags=["👥 Members"])
 app.include_router(payments.router, prefix="/api/payments", tags=["💰 Payments"])
+app.include_router(attendance.router, prefix="/api/attendance", tags=["📅 Attendance"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["📊 Dashboard"])
 app.include_router(settings.router, prefix="/api/settings", tags=["⚙️ Settings"])
 app.include_router(admin.router, prefix="/api/admin", tags=["🔧 Admin"])
 
+@app.on_event("startup")
+async def startup():
+    """Lanzar los jobs periódicos y el writer de asistencias, y precargar el cupo semanal"""
+    app.state.expiration_task = start_expiration_job()
+    attendance_writer.start()
+    await visit_quota.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Detener los jobs, confirmar asistencias pendientes y cerrar las conexiones del pool async"""
+    if app.state.expiration_task is not None:
+        app.state.expiration_task.cancel()
+    await attendance_writer.stop()
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
+    password_executor.shutdown()
+
 @app.get("/")
 async def root():
     """Endpoint raíz - Estado de la API"""
@@ -51,6 +129,7 @@ async def root():
         "available_endpoints": {
             "members": "/api/members",
             "payments": "/api/payments", 
+            "attendance": "/api/attendance",
             "dashboard": "/api/dashboard",
             "settings": "/api/settings",
             "admin": "/api/admin"
@@ -62,10 +141,8 @@ async def health_check():
     """Endpoint de health check"""
     try:
         # Verificar conexión a la base de datos
-        from app.database import SessionLocal
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         
         return {
             "status": "healthy",
@@ -93,4 +170,15 @@ async def api_info():
             "swagger": "/docs",
             "redoc": "/redoc"
         }
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+# Instrumentar todas las rutas registradas (latencia, throughput y errores por plantilla)
+metrics.instrument_app(app)
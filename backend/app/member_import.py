@@ -0,0 +1,200 @@
+"""
+Importación masiva de socios desde CSV o NDJSON.
+
+El archivo subido (ya volcado a disco por el parser multipart) se recorre en
+lotes de MEMBER_IMPORT_BATCH_SIZE registros. Cada lote se valida con
+`MemberCreate`, busca duplicados contra la base con una sola consulta y contra
+el resto del archivo con sets en memoria, y se inserta con un único executemany
+en su propia transacción. Los errores se informan por fila sin frenar el resto.
+
+La lectura y el parseo de cada lote corren en el threadpool para no bloquear el
+event loop mientras se recorre el archivo.
+"""
+from fastapi import HTTPException, UploadFile
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
+from typing import BinaryIO, Dict, Iterator, List, Set, Tuple, Union
+from app import models, schemas
+from app.membership_numbers import membership_number_allocator
+from app.memberships import calculate_membership_end_date
+import csv
+import io
+import json
+import os
+
+MEMBER_IMPORT_BATCH_SIZE = int(os.getenv("MEMBER_IMPORT_BATCH_SIZE", "500"))
+
+UNIQUE_FIELDS = ("email", "dni", "membership_number")
+
+def import_format(file: UploadFile) -> str:
+    """Detectar el formato del archivo por extensión o content type"""
+    filename = (file.filename or "").lower()
+    content_type = (file.content_type or "").lower()
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    raise HTTPException(status_code=400, detail="Unsupported file format, use CSV or NDJSON")
+
+def iter_records(file: BinaryIO, file_format: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """Recorrer el archivo devolviendo (fila, datos) o (fila, error de lectura)"""
+    text_stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(text_stream), start=1):
+                # Celdas vacías = campo ausente (los opcionales quedan en None)
+                yield row_number, {
+                    key.strip(): value.strip() for key, value in row.items()
+                    if key and isinstance(value, str) and value.strip()
+                }
+            return
+
+        row_number = 0
+        for line in text_stream:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, "Invalid JSON: expected an object"
+                continue
+            yield row_number, record
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
+        text_stream.detach()
+
+def iter_batches(records: Iterator[Tuple[int, Union[dict, str]]], size: int) -> Iterator[List[Tuple[int, Union[dict, str]]]]:
+    """Agrupar los registros en listas de hasta `size` elementos"""
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def format_validation_errors(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()]
+
+class MemberImporter:
+    """Importa socios por lotes acumulando el reporte de errores"""
+
+    def __init__(self, db: AsyncSession, batch_size: int = MEMBER_IMPORT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.total_rows = 0
+        self.imported = 0
+        self.errors: List[dict] = []
+        self.seen: Dict[str, Set[str]] = {field: set() for field in UNIQUE_FIELDS}
+        self.plan_ids: Set[int] = set()
+
+    async def run(self, records: Iterator[Tuple[int, Union[dict, str]]]) -> dict:
+        self.plan_ids = set((await self.db.scalars(select(models.MembershipPlan.id))).all())
+
+        # Cada lote se lee del archivo en un thread; la base se usa desde el event loop
+        async for batch in iterate_in_threadpool(iter_batches(records, self.batch_size)):
+            await self.import_batch(batch)
+
+        return {
+            "total_rows": self.total_rows,
+            "imported": self.imported,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+    def add_error(self, row_number: int, errors: List[str]):
+        self.errors.append({"row": row_number, "errors": errors})
+
+    async def existing_values(self, members: List[schemas.MemberCreate]) -> Dict[str, Set[str]]:
+        """Valores únicos del lote que ya existen en la base (una sola consulta)"""
+        conditions = []
+        for field in UNIQUE_FIELDS:
+            values = {getattr(member, field) for member in members if getattr(member, field)}
+            if values:
+                conditions.append(getattr(models.Member, field).in_(values))
+
+        existing = {field: set() for field in UNIQUE_FIELDS}
+        result = await self.db.execute(
+            select(*(getattr(models.Member, field) for field in UNIQUE_FIELDS)).where(or_(*conditions))
+        )
+        for row in result:
+            for field, value in zip(UNIQUE_FIELDS, row):
+                existing[field].add(value)
+        return existing
+
+    async def import_batch(self, batch: List[Tuple[int, Union[dict, str]]]):
+        # 1. Validación de esquema
+        valid: List[Tuple[int, schemas.MemberCreate]] = []
+        for row_number, record in batch:
+            self.total_rows += 1
+            if isinstance(record, str):
+                self.add_error(row_number, [record])
+                continue
+            try:
+                valid.append((row_number, schemas.MemberCreate.model_validate(record)))
+            except ValidationError as e:
+                self.add_error(row_number, format_validation_errors(e))
+        if not valid:
+            return
+
+        # 2. Duplicados contra la base y dentro del archivo, y plan existente
+        existing = await self.existing_values([member for _, member in valid])
+        accepted: List[Tuple[int, schemas.MemberCreate]] = []
+        for row_number, member in valid:
+            errors = []
+            for field in UNIQUE_FIELDS:
+                value = getattr(member, field)
+                if not value:
+                    continue
+                if value in existing[field]:
+                    errors.append(f"{field}: already registered")
+                elif value in self.seen[field]:
+                    errors.append(f"{field}: duplicated in file")
+            if member.membership_plan_id not in self.plan_ids:
+                errors.append("membership_plan_id: membership plan not found")
+            if errors:
+                self.add_error(row_number, errors)
+                continue
+            for field in UNIQUE_FIELDS:
+                if getattr(member, field):
+                    self.seen[field].add(getattr(member, field))
+            accepted.append((row_number, member))
+        if not accepted:
+            return
+
+        # 3. Números de socio: una sola reserva para las filas sin número
+        manual_numbers = [member.membership_number for _, member in accepted if member.membership_number]
+        if manual_numbers:
+            await membership_number_allocator.observe(*manual_numbers)
+        generated = iter(await membership_number_allocator.allocate_many(len(accepted) - len(manual_numbers)))
+
+        rows = []
+        for row_number, member in accepted:
+            member_data = member.dict()
+            member_data["membership_number"] = member.membership_number or next(generated)
+            member_data["membership_end_date"] = calculate_membership_end_date(member.membership_start_date)
+            rows.append((row_number, member_data))
+
+        # 4. Inserción del lote en una transacción
+        try:
+            await self.db.execute(insert(models.Member), [member_data for _, member_data in rows])
+            await self.db.commit()
+            self.imported += len(rows)
+        except IntegrityError:
+            # Un alta concurrente tomó algún valor único: reintentar fila por fila
+            await self.db.rollback()
+            for row_number, member_data in rows:
+                try:
+                    await self.db.execute(insert(models.Member), [member_data])
+                    await self.db.commit()
+                    self.imported += 1
+                except IntegrityError:
+                    await self.db.rollback()
+                    self.add_error(row_number, ["Duplicate email, DNI or membership number"])
@@ -0,0 +1,147 @@
+"""
+Read model `member_stats`: agregados de pagos por socio.
+
+Los endpoints de pagos aplican el cambio de cada pago (estado antes / después)
+con un único UPDATE atómico en la misma transacción: sumas y contadores por
+delta, y las fechas "última" se adelantan con CASE al agregar o se recalculan
+solo para ese socio cuando se quita el pago que las definía.
+
+`refresh_member_stats` recalcula desde `payments` (socios puntuales o todos) y
+es lo que usa el script `rebuild_member_stats.py`.
+"""
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, NamedTuple, Optional
+from app import models
+
+stats = models.MemberStats.__table__
+payments = models.Payment.__table__
+
+STATS_COLUMNS = [
+    "member_id", "total_verified_amount", "payment_count", "outstanding_amount",
+    "last_payment_date", "last_verified_at",
+]
+
+class PaymentState(NamedTuple):
+    """Lo que aporta un pago a los agregados de su socio y a revenue_daily"""
+    id: int
+    member_id: int
+    amount: Decimal
+    is_verified: bool
+    payment_date: Optional[datetime] = None
+    payment_method: Optional[str] = None
+    payment_concept: Optional[str] = None
+
+def payment_state(payment: models.Payment) -> PaymentState:
+    return PaymentState(
+        payment.id, payment.member_id, payment.amount or Decimal("0"), bool(payment.is_verified),
+        payment.payment_date, payment.payment_method, payment.payment_concept
+    )
+
+def stats_select(member_ids: Optional[Iterable[int]] = None):
+    """Agregados calculados desde payments, en el orden de STATS_COLUMNS"""
+    verified = payments.c.is_verified == True
+    query = select(
+        payments.c.member_id,
+        func.coalesce(func.sum(case((verified, payments.c.amount), else_=0)), 0),
+        func.count(payments.c.id),
+        func.coalesce(func.sum(case((verified, 0), else_=payments.c.amount)), 0),
+        func.max(payments.c.payment_date),
+        func.max(case((verified, payments.c.verified_at))),
+    ).group_by(payments.c.member_id)
+    if member_ids is not None:
+        query = query.where(payments.c.member_id.in_(list(member_ids)))
+    return query
+
+def _refresh_statements(member_ids: Optional[Iterable[int]]):
+    if member_ids is not None:
+        member_ids = list(member_ids)
+        clear = delete(stats).where(stats.c.member_id.in_(member_ids))
+    else:
+        clear = delete(stats)
+    return clear, insert(stats).from_select(STATS_COLUMNS, stats_select(member_ids))
+
+async def refresh_member_stats(db: AsyncSession, member_ids: Optional[Iterable[int]] = None):
+    """Recalcular los agregados de los socios indicados (o de todos) dentro de la transacción"""
+    for statement in _refresh_statements(member_ids):
+        await db.execute(statement)
+
+def rebuild_member_stats(conn: Connection):
+    """Reconstruir el read model completo (conexión sync, para scripts)"""
+    for statement in _refresh_statements(None):
+        conn.execute(statement)
+
+def _advance(column, payment_id: int, source_column):
+    """Mantener la fecha más reciente entre la guardada y la del pago"""
+    value = select(source_column).where(payments.c.id == payment_id).scalar_subquery()
+    return case((or_(column.is_(None), column < value), value), else_=column)
+
+def _recompute_max(member_id: int, source_column, *criteria):
+    return select(func.max(source_column)).where(payments.c.member_id == member_id, *criteria).scalar_subquery()
+
+async def apply_payment_change(db: AsyncSession, before: Optional[PaymentState], after: Optional[models.Payment]):
+    """Aplicar a member_stats el cambio de un pago: alta (before=None), baja (after=None) o modificación"""
+    await db.flush()
+    new = payment_state(after) if after is not None else None
+    member_id = (new or before).member_id
+    payment_id = (new or before).id
+
+    def contribution(state: Optional[PaymentState], verified: bool) -> Decimal:
+        return state.amount if state is not None and state.is_verified == verified else Decimal("0")
+
+    values = {}
+    count_delta = (new is not None) - (before is not None)
+    if count_delta:
+        values["payment_count"] = stats.c.payment_count + count_delta
+    verified_delta = contribution(new, True) - contribution(before, True)
+    if verified_delta:
+        values["total_verified_amount"] = stats.c.total_verified_amount + verified_delta
+    outstanding_delta = contribution(new, False) - contribution(before, False)
+    if outstanding_delta:
+        values["outstanding_amount"] = stats.c.outstanding_amount + outstanding_delta
+
+    if before is None:
+        values["last_payment_date"] = _advance(stats.c.last_payment_date, payment_id, payments.c.payment_date)
+    elif new is None:
+        values["last_payment_date"] = _recompute_max(member_id, payments.c.payment_date)
+
+    was_verified = before is not None and before.is_verified
+    is_verified = new is not None and new.is_verified
+    if is_verified and not was_verified:
+        values["last_verified_at"] = _advance(stats.c.last_verified_at, payment_id, payments.c.verified_at)
+    elif was_verified and not is_verified:
+        values["last_verified_at"] = _recompute_max(
+            member_id, payments.c.verified_at, payments.c.is_verified == True
+        )
+
+    if not values:
+        return
+    values["updated_at"] = func.now()
+    statement = update(stats).where(stats.c.member_id == member_id).values(values)
+    result = await db.execute(statement)
+    if result.rowcount:
+        return
+    try:
+        # Socio sin fila todavía (primer pago o alta previa al read model): calcularla completa
+        async with db.begin_nested():
+            await db.execute(insert(stats).from_select(STATS_COLUMNS, stats_select([member_id])))
+    except IntegrityError:
+        # Otra transacción creó la fila en paralelo: aplicar el delta sobre ella
+        await db.execute(statement)
+
+def member_stats_fields(member_stats: Optional[models.MemberStats]) -> dict:
+    """Campos de estadísticas para MemberWithStats (ceros si el socio no tiene pagos)"""
+    if member_stats is None:
+        return {"total_payments": Decimal("0"), "payment_count": 0, "outstanding_amount": Decimal("0"),
+                "last_payment_date": None, "last_verified_at": None}
+    return {
+        "total_payments": member_stats.total_verified_amount,
+        "payment_count": member_stats.payment_count,
+        "outstanding_amount": member_stats.outstanding_amount,
+        "last_payment_date": member_stats.last_payment_date,
+        "last_verified_at": member_stats.last_verified_at,
+    }
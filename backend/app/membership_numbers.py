@@ -0,0 +1,113 @@
+"""
+Asignación de números de socio (GYM{año}{secuencia}).
+
+Cada año tiene un contador en `membership_counters` que se incrementa con un
+UPDATE atómico en una transacción corta y separada de la del request, así dos
+altas concurrentes nunca reciben el mismo número ni hace falta buscar el último.
+
+Con MEMBERSHIP_NUMBER_BLOCK > 1 cada worker reserva bloques de números en memoria
+y solo toca la base cuando agota el bloque (a costa de huecos al reiniciar y de
+que los números no queden en orden de alta entre workers).
+"""
+from datetime import datetime
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import Dict, List, Optional, Tuple
+from app.database import async_engine
+from app import models
+import asyncio
+import os
+
+MEMBERSHIP_NUMBER_BLOCK = max(1, int(os.getenv("MEMBERSHIP_NUMBER_BLOCK", "1")))
+
+counters = models.MembershipCounter.__table__
+
+def format_membership_number(year: int, value: int) -> str:
+    """Formatear con ceros a la izquierda (4 dígitos)"""
+    return f"GYM{year}{value:04d}"
+
+def parse_membership_number(membership_number: str, year: int) -> Optional[int]:
+    """Número secuencial de un número de socio del año indicado (None si no corresponde)"""
+    prefix = f"GYM{year}"
+    if not membership_number or not membership_number.startswith(prefix):
+        return None
+    sequence = membership_number[len(prefix):]
+    return int(sequence) if sequence.isdigit() else None
+
+async def _existing_max(conn: AsyncConnection, year: int) -> int:
+    """Mayor secuencia ya usada en el año (solo al crear el contador)"""
+    numbers = (await conn.execute(
+        select(models.Member.membership_number).where(models.Member.membership_number.like(f"GYM{year}%"))
+    )).scalars()
+    return max((value for value in (parse_membership_number(n, year) for n in numbers) if value is not None), default=0)
+
+async def reserve_block(year: int, size: int) -> int:
+    """Reservar `size` números consecutivos del año y devolver el último"""
+    while True:
+        async with async_engine.begin() as conn:
+            result = await conn.execute(
+                update(counters).where(counters.c.year == year).values(last_value=counters.c.last_value + size)
+            )
+            if result.rowcount:
+                # La fila queda bloqueada hasta el commit: el valor leído es el propio
+                return await conn.scalar(select(counters.c.last_value).where(counters.c.year == year))
+        try:
+            async with async_engine.begin() as conn:
+                # Primer alta del año: continuar desde los números existentes
+                last_value = await _existing_max(conn, year) + size
+                await conn.execute(insert(counters).values(year=year, last_value=last_value))
+                return last_value
+        except IntegrityError:
+            # Otro worker creó el contador en paralelo: reintentar con UPDATE
+            continue
+
+async def advance_counter(year: int, value: int):
+    """Asegurar que el contador no vuelva a entregar un número cargado manualmente"""
+    async with async_engine.begin() as conn:
+        await conn.execute(
+            update(counters).where(counters.c.year == year, counters.c.last_value < value).values(last_value=value)
+        )
+
+class MembershipNumberAllocator:
+    """Reparte números de socio desde bloques reservados en el contador del año"""
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = block_size
+        self._blocks: Dict[int, Tuple[int, int]] = {}  # año -> (siguiente, último reservado)
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, year: Optional[int] = None) -> str:
+        """Asignar un número de socio"""
+        return (await self.allocate_many(1, year))[0]
+
+    async def allocate_many(self, count: int, year: Optional[int] = None) -> List[str]:
+        """Asignar `count` números de socio (importaciones masivas) con a lo sumo una reserva"""
+        year = year or datetime.now().year
+        async with self._lock:
+            next_value, last_value = self._blocks.get(year, (1, 0))
+            values = list(range(next_value, min(last_value, next_value + count - 1) + 1))
+            next_value += len(values)
+            missing = count - len(values)
+            if missing:
+                size = max(missing, self.block_size)
+                block_last = await reserve_block(year, size)
+                block_first = block_last - size + 1
+                values.extend(range(block_first, block_first + missing))
+                next_value, last_value = block_first + missing, block_last
+            self._blocks[year] = (next_value, last_value)
+        return [format_membership_number(year, value) for value in values]
+
+    async def observe(self, *membership_numbers: str):
+        """Registrar números asignados manualmente para no volver a entregarlos"""
+        year = datetime.now().year
+        value = max((parse_membership_number(n, year) or 0 for n in membership_numbers), default=0)
+        if not value:
+            return
+        await advance_counter(year, value)
+        async with self._lock:
+            next_value, last_value = self._blocks.get(year, (1, 0))
+            if next_value <= value <= last_value:
+                self._blocks[year] = (value + 1, last_value)
+
+membership_number_allocator = MembershipNumberAllocator(MEMBERSHIP_NUMBER_BLOCK)
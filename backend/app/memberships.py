@@ -0,0 +1,15 @@
+"""
+Reglas de membresía compartidas por las altas individuales y la importación masiva.
+"""
+from datetime import date
+import calendar
+
+def calculate_membership_end_date(start_date: date) -> date:
+    """Fecha de fin de membresía: 1 mes después de la fecha de inicio"""
+    if start_date.month == 12:
+        year, month = start_date.year + 1, 1
+    else:
+        year, month = start_date.year, start_date.month + 1
+    # Inicios a fin de mes (p. ej. 31/01) terminan el último día del mes siguiente
+    day = min(start_date.day, calendar.monthrange(year, month)[1])
+    return start_date.replace(year=year, month=month, day=day)
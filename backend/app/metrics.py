@@ -0,0 +1,274 @@
+"""
+Métricas en formato de texto de Prometheus.
+
+Registro mínimo en memoria (por proceso): contadores, gauges e histogramas
+con labels, más la instrumentación de rutas y del pool de conexiones.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.exceptions import HTTPException as StarletteHTTPException
+import threading
+import time
+
+# Buckets por defecto de los clientes oficiales de Prometheus (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base para métricas con labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def collect(self) -> List[str]:
+        values = self._callback() if self._callback else self._values
+        lines = self.header()
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteo por bucket (no acumulado) + inf, suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, *labels: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                data = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][index] += 1
+            data[1] += value
+            data[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((labels, [list(data[0]), data[1], data[2]]) for labels, data in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+class Registry:
+    """Conjunto de métricas expuestas en /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ====== HTTP ======
+
+http_requests_total = REGISTRY.register(Counter(
+    "http_requests_total", "Total de requests HTTP", ("method", "route", "status")
+))
+http_request_duration_seconds = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latencia de requests HTTP por ruta", ("method", "route")
+))
+http_requests_in_progress = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "Requests HTTP en curso por ruta", ("method", "route")
+))
+
+def instrument_route(route: APIRoute):
+    """Envolver la app ASGI de una ruta para medirla con su plantilla de path"""
+    inner_app = route.app
+    path = route.path
+
+    async def instrumented_app(scope, receive, send):
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method, path)
+        start = time.perf_counter()
+        try:
+            await inner_app(scope, receive, send_wrapper)
+        except StarletteHTTPException as exc:
+            # La respuesta la arma ExceptionMiddleware después de salir de la ruta
+            status_code = exc.status_code
+            raise
+        except RequestValidationError:
+            status_code = 422
+            raise
+        finally:
+            http_request_duration_seconds.observe(method, path, value=time.perf_counter() - start)
+            http_requests_in_progress.dec(method, path)
+            http_requests_total.inc(method, path, str(status_code))
+
+    route.app = instrumented_app
+
+def instrument_app(app):
+    """Instrumentar todas las rutas de la API (excepto /metrics)"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path != "/metrics":
+            instrument_route(route)
+
+# ====== POOL DE CONEXIONES ======
+
+db_pool_checkouts_total = REGISTRY.register(Counter(
+    "db_pool_checkouts_total", "Conexiones entregadas por el pool", ("engine",)
+))
+
+_pools: Dict[str, object] = {}
+
+def _pool_stats() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for name, pool in _pools.items():
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            getter = getattr(pool, stat, None)
+            if getter is not None:
+                # SQLAlchemy informa overflow negativo mientras el pool no está lleno
+                values[(name, stat)] = max(getter(), 0)
+    return values
+
+REGISTRY.register(Gauge(
+    "db_pool_connections", "Estado del pool de conexiones (size, checkedin, checkedout, overflow)",
+    ("engine", "state"), callback=_pool_stats
+))
+
+def instrument_pool(name: str, sync_engine):
+    """Exponer el estado del pool de un engine y contar sus checkouts"""
+    _pools[name] = sync_engine.pool
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts_total.inc(name)
+
+    event.listen(sync_engine, "checkout", on_checkout)
+
+# ====== CACHÉS ======
+
+cache_requests_total = REGISTRY.register(Counter(
+    "cache_requests_total", "Consultas a cachés internos por resultado", ("cache", "result")
+))
+
+def _cache_hit_ratios() -> Dict[Tuple[str, ...], float]:
+    caches = {labels[0] for labels in cache_requests_total._values}
+    ratios = {}
+    for cache in caches:
+        hits = cache_requests_total.get(cache, "hit")
+        total = hits + cache_requests_total.get(cache, "miss")
+        ratios[(cache,)] = hits / total if total else 0.0
+    return ratios
+
+REGISTRY.register(Gauge(
+    "cache_hit_ratio", "Proporción de aciertos por caché", ("cache",), callback=_cache_hit_ratios
+))
+
+def record_cache(cache: str, hit: bool):
+    """Registrar un acierto o fallo de caché"""
+    cache_requests_total.inc(cache, "hit" if hit else "miss")
+
+# ====== JOBS PROGRAMADOS ======
+
+job_runs_total = REGISTRY.register(Counter(
+    "job_runs_total", "Ejecuciones de jobs programados por resultado", ("job", "status")
+))
+job_rows_affected_total = REGISTRY.register(Counter(
+    "job_rows_affected_total", "Filas modificadas por jobs programados", ("job",)
+))
+job_duration_seconds = REGISTRY.register(Histogram(
+    "job_duration_seconds", "Duración de las ejecuciones de jobs programados", ("job",)
+))
+job_last_success_timestamp_seconds = REGISTRY.register(Gauge(
+    "job_last_success_timestamp_seconds", "Momento (epoch) de la última ejecución exitosa", ("job",)
+))
+
+def record_job_run(job: str, duration: float, rows: int = 0, success: bool = True):
+    """Registrar una ejecución de un job (filas afectadas y duración)"""
+    job_runs_total.inc(job, "success" if success else "error")
+    job_duration_seconds.observe(job, value=duration)
+    if success:
+        job_rows_affected_total.inc(job, amount=rows)
+        job_last_success_timestamp_seconds.set(job, value=time.time())
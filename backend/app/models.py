@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Numeric, Text, Date
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Numeric, Text, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -19,9 +19,35 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class RefreshToken(Base):
+    """Modelo para refresh tokens (solo se guarda el hash SHA-256 del token)"""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)  # Cadena de rotaciones desde un mismo login
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relaciones
+    user = relationship("User")
+
+class MembershipCounter(Base):
+    """Contador por año para asignar números de socio (GYM{año}{secuencia})"""
+    __tablename__ = "membership_counters"
+    
+    year = Column(Integer, primary_key=True, autoincrement=False)
+    last_value = Column(Integer, nullable=False, default=0)  # Último número reservado
+
 class Member(Base):
     """Modelo para socios del gimnasio"""
     __tablename__ = "members"
+    __table_args__ = (
+        # Vencimiento de membresías y /expiring: solo los activos, por fecha de fin
+        Index("ix_members_active_end_date", "is_active", "membership_end_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     membership_number = Column(String(20), unique=True, nullable=False, index=True)
@@ -36,26 +62,31 @@ class Member(Base):
     emergency_contact_phone = Column(String(20))
     membership_plan_id = Column(Integer, ForeignKey("membership_plans.id"), nullable=False)
     membership_start_date = Column(Date, nullable=False)
-    membership_end_date = Column(Date, nullable=False)  # Se calcula automáticamente (start_date + 1 mes)
+    membership_end_date = Column(Date, nullable=False, index=True)  # Se calcula automáticamente (start_date + 1 mes)
     is_active = Column(Boolean, default=True)
     trainer_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Entrenador asignado
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relaciones
-    membership_plan = relationship("MembershipPlan")
+    # Relaciones (raise_on_sql: los endpoints deben cargarlas explícitamente, sin N+1)
+    membership_plan = relationship("MembershipPlan", lazy="raise_on_sql")
     payments = relationship("Payment", back_populates="member", cascade="all, delete-orphan")
-    trainer = relationship("User", foreign_keys=[trainer_id])  # Entrenador asignado
+    trainer = relationship("User", foreign_keys=[trainer_id], lazy="raise_on_sql")  # Entrenador asignado
 
 class Payment(Base):
     """Modelo para pagos de membresías"""
     __tablename__ = "payments"
+    __table_args__ = (
+        # Rangos de fecha sobre pagos verificados (dashboard, estadísticas) y por socio
+        Index("ix_payments_verified_payment_date", "is_verified", "payment_date"),
+        Index("ix_payments_member_payment_date", "member_id", "payment_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
     amount = Column(Numeric(10, 2), nullable=False)
-    payment_date = Column(DateTime(timezone=True), server_default=func.now())
+    payment_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     payment_method = Column(String(20), nullable=False)  # cash, card, transfer, check
     payment_concept = Column(String(50), nullable=False)  # membership, registration, personal_training
     description = Column(Text)
@@ -65,10 +96,60 @@ class Payment(Base):
     verified_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # payment_date viene del servidor: traerlo al insertar (lo usa el rollup revenue_daily)
+    __mapper_args__ = {"eager_defaults": True}
+    
     # Relaciones
-    member = relationship("Member", back_populates="payments")
+    member = relationship("Member", back_populates="payments", lazy="raise_on_sql")
     verifier = relationship("User", foreign_keys=[verified_by])
 
+class Attendance(Base):
+    """Modelo para registros de asistencia (check-ins), solo se insertan"""
+    __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ix_attendance_member_checked_in", "member_id", "checked_in_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
+    checked_in_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    method = Column(String(20), nullable=False)  # dni, membership_number
+    
+    # Relaciones
+    member = relationship("Member", lazy="raise_on_sql")
+
+class WeeklyVisitCounter(Base):
+    """Días con asistencia por socio y semana ISO (cupo de days_per_week del plan)"""
+    __tablename__ = "weekly_visits"
+    
+    member_id = Column(Integer, ForeignKey("members.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # Lunes de la semana
+    days_used = Column(Integer, nullable=False, default=0)
+    last_visit_date = Column(Date, nullable=False)
+
+class MemberStats(Base):
+    """Agregados de pagos por socio (read model mantenido por los endpoints de pagos)"""
+    __tablename__ = "member_stats"
+    
+    member_id = Column(Integer, ForeignKey("members.id"), primary_key=True)
+    total_verified_amount = Column(Numeric(12, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+    outstanding_amount = Column(Numeric(12, 2), nullable=False, default=0)  # Pagos sin verificar
+    last_payment_date = Column(DateTime(timezone=True), nullable=True)
+    last_verified_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RevenueDaily(Base):
+    """Rollup diario de pagos por método, concepto y estado (mantenido por los endpoints de pagos)"""
+    __tablename__ = "revenue_daily"
+    
+    day = Column(Date, primary_key=True)  # Fecha de payment_date
+    payment_method = Column(String(20), primary_key=True)
+    payment_concept = Column(String(50), primary_key=True)
+    is_verified = Column(Boolean, primary_key=True)
+    amount = Column(Numeric(12, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
 class GymSettings(Base):
     """Modelo para configuración general del gimnasio"""
     __tablename__ = "gym_settings"
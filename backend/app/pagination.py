@@ -0,0 +1,56 @@
+"""
+Paginación por cursor (keyset).
+
+El cursor es opaco para el cliente: JSON con la clave de orden + id de la última
+fila de la página, codificado en base64 URL-safe.
+"""
+from datetime import date, datetime
+from fastapi import HTTPException, Response
+from sqlalchemy import func, select, tuple_
+from typing import Any, List
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _serialize(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_cursor(*values: Any) -> str:
+    """Codificar los valores de la clave de orden en un cursor opaco"""
+    raw = json.dumps([_serialize(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> List[Any]:
+    """Decodificar un cursor y convertir cada valor al tipo indicado"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor length mismatch")
+        return [
+            value if value is None else
+            datetime.fromisoformat(value) if value_type is datetime else
+            date.fromisoformat(value) if value_type is date else
+            value_type(value)
+            for value, value_type in zip(values, types)
+        ]
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def set_next_cursor(response: Response, rows: list, limit: int, *key_attrs: str):
+    """Exponer el cursor de la página siguiente si la página actual está completa"""
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(getattr(last, attr) for attr in key_attrs))
+
+def keyset_before(date_column, id_column, cursor: str):
+    """Filtro keyset para orden descendente (fecha, id): filas posteriores al cursor"""
+    after_date, after_id = decode_cursor(cursor, datetime, int)
+    # Se compara contra el valor almacenado de la fila ancla (SQLite guarda fechas como
+    # texto y el formato puede diferir del valor enlazado); la fecha del cursor solo se
+    # usa si esa fila fue eliminada entre páginas
+    anchor_date = select(date_column).where(id_column == after_id).scalar_subquery()
+    return tuple_(date_column, id_column) < tuple_(func.coalesce(anchor_date, after_date), after_id)
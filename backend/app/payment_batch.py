@@ -0,0 +1,65 @@
+"""
+Alta masiva de pagos (picos de inicio de mes).
+
+Cada ítem se valida con `PaymentCreate`; los socios referenciados se buscan con
+una sola consulta IN y los pagos válidos se insertan con un executemany en una
+única transacción, junto con la actualización de member_stats y revenue_daily.
+Los ítems con errores se informan por posición sin frenar al resto.
+"""
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List
+from app import models, schemas
+from app.member_import import format_validation_errors
+from app.member_stats import refresh_member_stats
+from app.revenue_daily import refresh_revenue_daily
+import os
+
+PAYMENT_BULK_MAX_ITEMS = int(os.getenv("PAYMENT_BULK_MAX_ITEMS", "10000"))
+
+payments = models.Payment.__table__
+
+async def create_payments_bulk(db: AsyncSession, items: List[Any]) -> schemas.PaymentBulkResult:
+    """Validar e insertar los pagos; los inválidos quedan en el reporte de errores"""
+    errors: Dict[int, List[str]] = {}
+    valid: Dict[int, schemas.PaymentCreate] = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = ["Invalid item: expected an object"]
+            continue
+        try:
+            valid[index] = schemas.PaymentCreate.model_validate(item)
+        except ValidationError as e:
+            errors[index] = format_validation_errors(e)
+
+    # Una sola consulta para todos los socios referenciados
+    member_ids = {payment.member_id for payment in valid.values()}
+    active = dict((await db.execute(
+        select(models.Member.id, models.Member.is_active).where(models.Member.id.in_(member_ids))
+    )).all()) if member_ids else {}
+
+    # Mismo instante para todo el lote (se usa también para el día del rollup)
+    payment_date = datetime.utcnow()
+    rows = []
+    for index, payment in valid.items():
+        if payment.member_id not in active:
+            errors[index] = ["member_id: Member not found"]
+        elif not active[payment.member_id]:
+            errors[index] = ["member_id: Cannot register payment for inactive member"]
+        else:
+            rows.append({**payment.dict(), "payment_date": payment_date, "is_verified": False})
+
+    if rows:
+        await db.execute(insert(payments), rows)
+        await refresh_member_stats(db, {row["member_id"] for row in rows})
+        await refresh_revenue_daily(db, [payment_date.date()])
+        await db.commit()
+
+    return schemas.PaymentBulkResult(
+        total=len(items),
+        created=len(rows),
+        failed=len(errors),
+        errors=[schemas.PaymentBulkError(index=index, errors=messages) for index, messages in sorted(errors.items())]
+    )
@@ -0,0 +1,44 @@
+"""
+Consultas de pagos que deben resolverse con un índice, y su plan (EXPLAIN).
+
+Arman los mismos predicados que los endpoints (rangos semiabiertos sobre
+payment_date, ver app/date_ranges.py). `tests/test_query_plans.py` verifica los
+planes en SQLite y `explain_payment_queries.py` contra una base PostgreSQL.
+"""
+from datetime import date, timedelta
+from sqlalchemy import func, select, text
+from typing import List, Optional, Tuple
+from app.date_ranges import day_range, day_start, month_range, within
+from app.models import Payment
+
+def payment_index_queries(today: Optional[date] = None) -> List[Tuple[str, object, str]]:
+    """(descripción, consulta, índice esperado)"""
+    today = today or date.today()
+    verified = Payment.is_verified == True
+    return [
+        ("Pagos verificados de hoy (dashboard, /payments/stats/today)",
+         select(func.sum(Payment.amount)).where(within(Payment.payment_date, day_range(today)), verified),
+         "ix_payments_verified_payment_date"),
+        ("Pagos verificados del mes (dashboard, /payments/stats/month)",
+         select(func.sum(Payment.amount)).where(within(Payment.payment_date, month_range(today.year, today.month)), verified),
+         "ix_payments_verified_payment_date"),
+        ("Cantidad de pagos del día",
+         select(func.count(Payment.id)).where(within(Payment.payment_date, day_range(today))),
+         "ix_payments_payment_date"),
+        ("Pagos de un socio en un rango (listado con member_id, start_date, end_date)",
+         select(Payment.id).where(
+             Payment.member_id == 1,
+             Payment.payment_date >= day_start(today - timedelta(days=90)),
+             Payment.payment_date < day_start(today + timedelta(days=1))
+         ).order_by(Payment.payment_date.desc()),
+         "ix_payments_member_payment_date"),
+    ]
+
+def explain(conn, query) -> str:
+    """Plan de la consulta como texto (EXPLAIN QUERY PLAN en SQLite, EXPLAIN en PostgreSQL)"""
+    if conn.dialect.name == "sqlite":
+        compiled = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+        return "\n".join(row[-1] for row in rows)
+    compiled = query.compile(dialect=conn.dialect)
+    return "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params))
@@ -0,0 +1,114 @@
+"""
+Ingresos agrupados por período (día / semana ISO / mes).
+
+Una sola consulta GROUP BY sobre el rango pedido devuelve todos los períodos;
+los que no tienen pagos se completan con cero en Python. Se lee del rollup
+`revenue_daily` salvo el desglose por plan, que agrupa `payments` (filtro
+semiabierto sobre el índice de pagos verificados). El truncado de fechas se compila según
+el motor: `date(...)` con modificadores en SQLite y `date_trunc` en Postgres.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import Date, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from typing import Dict, List, Optional
+from app import models
+from app.date_ranges import GRANULARITIES, bucket_start, buckets, day_start, within
+
+# Desgloses disponibles además del período
+BREAKDOWNS = ("payment_method", "payment_concept", "plan")
+BREAKDOWN_PATTERN = f"^({'|'.join(BREAKDOWNS)})$"
+GRANULARITY_PATTERN = f"^({'|'.join(GRANULARITIES)})$"
+
+class date_bucket(FunctionElement):
+    """Inicio del período (día, semana o mes) de una columna DateTime, como fecha"""
+    type = Date()
+    # La granularidad cambia el SQL generado y no forma parte de la clave de caché
+    inherit_cache = False
+
+    def __init__(self, column, granularity: str):
+        self.granularity = granularity
+        super().__init__(column)
+
+@compiles(date_bucket)
+def _date_bucket_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"CAST(date_trunc('{element.granularity}', {column}) AS DATE)"
+
+@compiles(date_bucket, "sqlite")
+def _date_bucket_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    modifiers = {
+        "day": "",
+        # 'weekday 0' avanza al domingo (o se queda si ya lo es); 6 días antes es el lunes
+        "week": ", 'weekday 0', '-6 days'",
+        "month": ", 'start of month'",
+    }[element.granularity]
+    return f"date({column}{modifiers})"
+
+def _as_date(value) -> date:
+    # SQLite devuelve el texto de date(); Postgres un date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def revenue_query(start: date, end: date, granularity: str, breakdown: Optional[str] = None):
+    """SUM de pagos verificados por período (y desglose) entre start y end inclusive"""
+    if breakdown == "plan":
+        return _payments_revenue_query(start, end, granularity)
+    # Desde el rollup diario: pocas filas por día en lugar de todos los pagos
+    rollup = models.RevenueDaily
+    bucket = date_bucket(rollup.day, granularity).label("bucket")
+    columns = [bucket]
+    if breakdown:
+        columns.append(getattr(rollup, breakdown).label("breakdown"))
+    return select(*columns, func.sum(rollup.amount), func.sum(rollup.payment_count)).where(
+        rollup.is_verified == True,
+        within(rollup.day, (start, end + timedelta(days=1)))
+    ).group_by(*columns)
+
+def _payments_revenue_query(start: date, end: date, granularity: str):
+    """Desglose por plan: el rollup no guarda el socio, se agrupa sobre payments"""
+    bucket = date_bucket(models.Payment.payment_date, granularity).label("bucket")
+    plan = models.MembershipPlan.name.label("breakdown")
+    return select(bucket, plan, func.sum(models.Payment.amount), func.count(models.Payment.id)).join(
+        models.Member, models.Payment.member_id == models.Member.id
+    ).outerjoin(
+        models.MembershipPlan, models.Member.membership_plan_id == models.MembershipPlan.id
+    ).where(
+        models.Payment.is_verified == True,
+        within(models.Payment.payment_date, (day_start(start), day_start(end + timedelta(days=1))))
+    ).group_by(bucket, plan)
+
+async def revenue_trends(
+    db: AsyncSession, start: date, end: date, granularity: str, breakdown: Optional[str] = None
+) -> List[dict]:
+    """Ingresos por período, del más antiguo al más reciente, incluidos los períodos sin pagos"""
+    start = bucket_start(start, granularity)
+    revenue: Dict[date, Decimal] = defaultdict(Decimal)
+    counts: Dict[date, int] = defaultdict(int)
+    detail: Dict[date, Dict[str, Decimal]] = defaultdict(dict)
+
+    for row in (await db.execute(revenue_query(start, end, granularity, breakdown))).all():
+        bucket = _as_date(row[0])
+        amount, count = row[-2] or Decimal("0"), row[-1]
+        revenue[bucket] += amount
+        counts[bucket] += count
+        if breakdown:
+            key = row[1] if row[1] is not None else "unknown"
+            detail[bucket][key] = detail[bucket].get(key, Decimal("0")) + amount
+
+    result = []
+    for bucket in buckets(start, end, granularity):
+        item = {
+            "period_start": bucket,
+            "revenue": float(revenue[bucket]),
+            "payment_count": counts[bucket],
+        }
+        if granularity == "month":
+            item["year"], item["month"] = bucket.year, bucket.month
+        if breakdown:
+            item["breakdown"] = {key: float(amount) for key, amount in sorted(detail[bucket].items())}
+        result.append(item)
+    return result
@@ -0,0 +1,143 @@
+"""
+Rollup `revenue_daily`: importe y cantidad de pagos por día, método, concepto y
+estado de verificación.
+
+Los endpoints de pagos aplican el cambio de cada pago (estado antes / después)
+en la misma transacción: se resta lo que aportaba a su fila y se suma a la nueva
+con UPDATE atómicos, creando la fila si todavía no existe. Las estadísticas del
+dashboard y de pagos leen estas pocas filas en lugar de todo el historial.
+
+`refresh_revenue_daily` recalcula días puntuales (o todos) desde `payments`;
+`rebuild_revenue_daily.py` lo usa para el backfill y `check_revenue_daily` para
+detectar diferencias.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from app import models
+from app.date_ranges import day_start, within
+from app.member_stats import PaymentState, payment_state
+from app.revenue import date_bucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+rollup = models.RevenueDaily.__table__
+payments = models.Payment.__table__
+
+ROLLUP_KEY = ("day", "payment_method", "payment_concept", "is_verified")
+ROLLUP_COLUMNS = [*ROLLUP_KEY, "amount", "payment_count"]
+
+class RollupKey(NamedTuple):
+    day: date
+    payment_method: str
+    payment_concept: str
+    is_verified: bool
+
+def rollup_key(state: PaymentState) -> RollupKey:
+    return RollupKey(state.payment_date.date(), state.payment_method, state.payment_concept, state.is_verified)
+
+def rollup_select(days: Optional[Iterable[date]] = None):
+    """Filas del rollup calculadas desde payments, en el orden de ROLLUP_COLUMNS"""
+    day = date_bucket(payments.c.payment_date, "day")
+    query = select(
+        day, payments.c.payment_method, payments.c.payment_concept, payments.c.is_verified,
+        func.coalesce(func.sum(payments.c.amount), 0), func.count(payments.c.id)
+    ).group_by(day, payments.c.payment_method, payments.c.payment_concept, payments.c.is_verified)
+    if days is not None:
+        days = sorted(set(days))
+        # Rango sobre el índice de payment_date y luego solo los días pedidos
+        query = query.where(
+            within(payments.c.payment_date, (day_start(days[0]), day_start(days[-1] + timedelta(days=1)))),
+            day.in_(days)
+        )
+    return query
+
+def _refresh_statements(days: Optional[Iterable[date]]):
+    if days is not None:
+        days = sorted(set(days))
+        clear = delete(rollup).where(rollup.c.day.in_(days))
+    else:
+        clear = delete(rollup)
+    return clear, insert(rollup).from_select(ROLLUP_COLUMNS, rollup_select(days))
+
+async def refresh_revenue_daily(db: AsyncSession, days: Optional[Iterable[date]] = None):
+    """Recalcular los días indicados (o todos) dentro de la transacción"""
+    if days is not None:
+        days = list(days)
+        if not days:
+            return
+    for statement in _refresh_statements(days):
+        await db.execute(statement)
+
+def rebuild_revenue_daily(conn: Connection):
+    """Reconstruir el rollup completo (conexión sync, para scripts)"""
+    for statement in _refresh_statements(None):
+        conn.execute(statement)
+
+def backfill_revenue_daily(bind):
+    """Construir el rollup si está vacío y ya hay pagos (primer arranque con la tabla nueva)"""
+    with bind.begin() as conn:
+        if conn.execute(select(rollup.c.day).limit(1)).first() is not None:
+            return
+        if conn.execute(select(payments.c.id).limit(1)).first() is None:
+            return
+        rebuild_revenue_daily(conn)
+        logger.info("revenue_daily rollup backfilled from payments")
+
+async def _apply_delta(db: AsyncSession, key: RollupKey, amount: Decimal, count: int):
+    where = [rollup.c[name] == value for name, value in zip(ROLLUP_KEY, key)]
+    values = {"amount": rollup.c.amount + amount, "payment_count": rollup.c.payment_count + count}
+    result = await db.execute(update(rollup).where(*where).values(values))
+    if result.rowcount:
+        return
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(rollup).values(**key._asdict(), amount=amount, payment_count=count))
+    except IntegrityError:
+        # Otra transacción creó la fila en paralelo
+        await db.execute(update(rollup).where(*where).values(values))
+
+async def apply_revenue_change(db: AsyncSession, before: Optional[PaymentState], after: Optional[models.Payment]):
+    """Aplicar a revenue_daily el cambio de un pago: alta (before=None), baja (after=None) o modificación"""
+    deltas: Dict[RollupKey, Tuple[Decimal, int]] = defaultdict(lambda: (Decimal("0"), 0))
+    if before is not None:
+        amount, count = deltas[rollup_key(before)]
+        deltas[rollup_key(before)] = (amount - before.amount, count - 1)
+    if after is not None:
+        new = payment_state(after)
+        amount, count = deltas[rollup_key(new)]
+        deltas[rollup_key(new)] = (amount + new.amount, count + 1)
+
+    for key, (amount, count) in deltas.items():
+        if amount or count:
+            await _apply_delta(db, key, amount, count)
+
+def check_revenue_daily(conn: Connection) -> List[dict]:
+    """Diferencias entre el rollup guardado y el calculado desde payments (vacío si coinciden)"""
+    def as_dict(rows) -> Dict[RollupKey, Tuple[Decimal, int]]:
+        result = {}
+        for day, method, concept, verified, amount, count in rows:
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            result[RollupKey(day, method, concept, bool(verified))] = (Decimal(amount or 0), count)
+        return result
+
+    stored = as_dict(conn.execute(select(*[rollup.c[name] for name in ROLLUP_COLUMNS])))
+    expected = as_dict(conn.execute(rollup_select()))
+    mismatches = []
+    for key in sorted(set(stored) | set(expected)):
+        stored_value = stored.get(key, (Decimal("0"), 0))
+        expected_value = expected.get(key, (Decimal("0"), 0))
+        if stored_value != expected_value:
+            mismatches.append({
+                **key._asdict(),
+                "stored_amount": stored_value[0], "stored_count": stored_value[1],
+                "expected_amount": expected_value[0], "expected_count": expected_value[1],
+            })
+    return mismatches
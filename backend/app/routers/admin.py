@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app import models
 from app.routers.auth import get_current_user
+from app.expiration import expire_memberships
+from app.visit_quota import visit_quota
 import logging
 
 # Configure logging
@@ -13,8 +15,8 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/reset-database")
-def reset_database(
-    db: Session = Depends(get_db),
+async def reset_database(
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
@@ -34,12 +36,17 @@ def reset_database(
         logger.info("Starting database reset operation")
         
         # Deshabilitar verificaciones de claves foráneas temporalmente
-        db.execute(text("PRAGMA foreign_keys=OFF"))
+        await db.execute(text("PRAGMA foreign_keys=OFF"))
         
         # Eliminar todos los registros en orden específico
         tables_to_clear = [
+            "member_stats",
+            "revenue_daily",
+            "attendance",
+            "weekly_visits",
             "payments", 
             "members",
+            "membership_counters",
             "membership_plans",
             "schedules",
             "gym_settings"
@@ -48,7 +55,7 @@ def reset_database(
         deleted_counts = {}
         for table in tables_to_clear:
             try:
-                result = db.execute(text(f"DELETE FROM {table}"))
+                result = await db.execute(text(f"DELETE FROM {table}"))
                 deleted_counts[table] = result.rowcount if hasattr(result, 'rowcount') else 0
                 logger.info(f"Cleared table {table}: {deleted_counts[table]} records")
             except Exception as table_error:
@@ -57,16 +64,17 @@ def reset_database(
         
         # Resetear secuencias de auto-incremento
         try:
-            db.execute(text("DELETE FROM sqlite_sequence WHERE name IN ('payments', 'members', 'membership_plans', 'schedules', 'gym_settings')"))
+            await db.execute(text("DELETE FROM sqlite_sequence WHERE name IN ('payments', 'members', 'membership_plans', 'schedules', 'gym_settings')"))
             logger.info("Reset auto-increment sequences")
         except Exception as seq_error:
             logger.warning(f"Could not reset sequences: {str(seq_error)}")
         
         # Rehabilitar verificaciones de claves foráneas
-        db.execute(text("PRAGMA foreign_keys=ON"))
+        await db.execute(text("PRAGMA foreign_keys=ON"))
         
         # Confirmar cambios
-        db.commit()
+        await db.commit()
+        visit_quota.clear()
         logger.info("Database reset completed successfully")
         
         return {
@@ -80,9 +88,23 @@ def reset_database(
         
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Database reset failed: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al resetear la base de datos: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/expire-memberships")
+async def run_membership_expiration(
+    current_user: models.User = Depends(get_current_user)
+):
+    """Ejecutar ahora el job de vencimiento de membresías"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden ejecutar el vencimiento de membresías"
+        )
+    
+    return await expire_memberships()
@@ -0,0 +1,146 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime, date, timedelta
+from app.database import client_key, get_db, get_read_db, mark_recent_write, query_budget
+from app import models, schemas
+from app.attendance import attendance_writer
+from app.visit_quota import is_unlimited, visit_quota
+from app.date_ranges import day_start
+from app.pagination import keyset_before, set_next_cursor
+from app.routers.auth import get_current_user
+
+router = APIRouter()
+
+@router.post("/check-in", response_model=schemas.CheckInResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(query_budget(6))])
+async def check_in(
+    request: Request,
+    check_in_data: schemas.CheckInRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Registrar la asistencia de un socio por DNI o número de socio"""
+    
+    identifier = check_in_data.identifier.strip()
+    
+    # Una sola consulta por los índices únicos de DNI y número de socio
+    member = (await db.execute(select(
+        models.Member.id,
+        models.Member.first_name,
+        models.Member.last_name,
+        models.Member.dni,
+        models.Member.membership_number,
+        models.Member.membership_end_date,
+        models.Member.is_active,
+        models.MembershipPlan.days_per_week
+    ).outerjoin(models.MembershipPlan, models.Member.membership_plan_id == models.MembershipPlan.id).where(or_(
+        models.Member.dni == identifier,
+        models.Member.membership_number == identifier
+    )).limit(1))).first()
+    
+    if member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    
+    if not member.is_active:
+        raise HTTPException(status_code=400, detail="Member is not active")
+    
+    # Hora local, la misma que usan las ventanas por día (listado, dashboard y cupo semanal)
+    checked_in_at = datetime.now()
+    today = checked_in_at.date()
+    if member.membership_end_date < today:
+        raise HTTPException(status_code=400, detail="Membership expired")
+    
+    # Cupo semanal del plan: desde memoria salvo el primer ingreso del día
+    quota = await visit_quota.consume(member.id, member.days_per_week, today)
+    if not quota.allowed:
+        raise HTTPException(status_code=403, detail="Weekly visit limit reached")
+    
+    # Fuera de la sesión del request: el writer agrupa los check-ins concurrentes
+    try:
+        await attendance_writer.record({
+            "member_id": member.id,
+            "checked_in_at": checked_in_at,
+            "method": "dni" if member.dni == identifier else "membership_number"
+        })
+    except Exception:
+        # La asistencia no quedó registrada: no debe descontar cupo
+        if quota.consumed:
+            await visit_quota.release(member.id, today)
+        raise
+    # El writer no usa la sesión del request: marcar la escritura para leer del primario
+    mark_recent_write(client_key(request))
+    
+    return {
+        "member_id": member.id,
+        "member_name": f"{member.first_name} {member.last_name}",
+        "membership_number": member.membership_number,
+        "checked_in_at": checked_in_at,
+        "membership_end_date": member.membership_end_date,
+        "days_remaining": (member.membership_end_date - today).days,
+        "days_per_week": member.days_per_week,
+        "weekly_visits": None if is_unlimited(member.days_per_week) else quota.days_used
+    }
+
+@router.get("/quota/{member_id}", response_model=schemas.VisitQuota, dependencies=[Depends(query_budget(3))])
+async def get_visit_quota(
+    member_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Cupo semanal de un socio: días usados y si puede ingresar hoy"""
+    
+    days_per_week = (await db.execute(
+        select(models.MembershipPlan.days_per_week)
+        .select_from(models.Member)
+        .outerjoin(models.MembershipPlan, models.Member.membership_plan_id == models.MembershipPlan.id)
+        .where(models.Member.id == member_id)
+    )).first()
+    
+    if days_per_week is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    
+    days_per_week = days_per_week[0]
+    quota = await visit_quota.status(member_id, days_per_week)
+    return {
+        "member_id": member_id,
+        "days_per_week": days_per_week,
+        "days_used": quota.days_used,
+        "visited_today": quota.visited_today,
+        "can_enter": quota.allowed
+    }
+
+@router.get("/", response_model=List[schemas.Attendance], dependencies=[Depends(query_budget(2))])
+async def list_attendance(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor de la página siguiente (header X-Next-Cursor)"),
+    member_id: Optional[int] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Listar asistencias, más recientes primero"""
+    
+    query = select(models.Attendance)
+    
+    if member_id:
+        query = query.where(models.Attendance.member_id == member_id)
+    
+    # Rangos semiabiertos sobre checked_in_at para usar el índice
+    if start_date:
+        query = query.where(models.Attendance.checked_in_at >= day_start(start_date))
+    
+    if end_date:
+        query = query.where(models.Attendance.checked_in_at < day_start(end_date + timedelta(days=1)))
+    
+    query = query.order_by(models.Attendance.checked_in_at.desc(), models.Attendance.id.desc())
+    
+    if after:
+        query = query.where(keyset_before(models.Attendance.checked_in_at, models.Attendance.id, after))
+    
+    records = (await db.scalars(query.limit(limit))).all()
+    set_next_cursor(response, records, limit, "checked_in_at", "id")
+    return records
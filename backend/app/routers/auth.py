@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, inspect, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from typing import Optional
 from app.database import get_db
+from app.cache import TTLCache
+from app.fieldsets import fields_response, parse_fields, project, schema_columns
+from app.security import verify_password, verify_and_update_password, get_password_hash
 from app import models, schemas
 import os
+import time
 import hashlib
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,32 +25,37 @@ router = APIRouter()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 
-# Usar hashlib en lugar de bcrypt para evitar problemas de compatibilidad
-import hashlib
+# Caché de autenticación: tokens ya verificados (token -> username) y usuarios resueltos
+# (username -> columnas). La vigencia acota cuánto tarda otro worker en ver un cambio.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
+token_cache = TTLCache("auth_tokens", AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache("auth_users", AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verificar contraseña usando hashlib"""
-    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+USER_COLUMNS = [attr.key for attr in inspect(models.User).column_attrs]
 
-def get_password_hash(password: str) -> str:
-    """Hashear contraseña usando hashlib"""
-    return hashlib.sha256(password.encode()).hexdigest()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
-def authenticate_user(db: Session, username_or_email: str, password: str):
+async def authenticate_user(db: AsyncSession, username_or_email: str, password: str):
     """Autenticar usuario por username o email"""
     # Buscar por username o email
-    user = db.query(models.User).filter(
+    user = await db.scalar(select(models.User).where(
         (models.User.username == username_or_email) | 
         (models.User.email == username_or_email)
-    ).first()
+    ).limit(1))
     
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Actualizar hashes heredados (SHA-256 sin sal); se confirma junto con el login
+        user.hashed_password = new_hash
+        invalidate_user_cache(user.username)
     if not user.is_active:
         return False
     return user
@@ -59,7 +72,65 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def invalidate_user_cache(*usernames: str):
+    """Descartar usuarios cacheados tras modificarlos"""
+    for username in usernames:
+        if username:
+            user_cache.pop(username)
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    """Resolver usuario por username usando la caché cuando es posible"""
+    cached = user_cache.get(username)
+    if cached is not None:
+        # Reconstruir la instancia y adjuntarla a la sesión sin ir a la base
+        user = models.User(**cached)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+    
+    user = await db.scalar(select(models.User).where(models.User.username == username))
+    if user is not None:
+        user_cache.set(username, {column: getattr(user, column) for column in USER_COLUMNS})
+    return user
+
+def hash_refresh_token(token: str) -> str:
+    """Hash con el que se guarda el refresh token (el token en claro nunca se persiste)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_refresh_token(db: AsyncSession, user_id: int, family_id: str = None) -> str:
+    """Crear refresh token; el llamador confirma la transacción"""
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+async def revoke_refresh_tokens(db: AsyncSession, *criteria):
+    """Revocar los refresh tokens vigentes que cumplan los criterios"""
+    await db.execute(update(models.RefreshToken).where(
+        models.RefreshToken.revoked_at.is_(None),
+        *criteria
+    ).values(revoked_at=datetime.utcnow()))
+
+async def issue_tokens(db: AsyncSession, user: models.User) -> dict:
+    """Emitir access token + refresh token para un login exitoso"""
+    # Limpiar tokens vencidos del usuario para mantener la tabla compacta
+    await db.execute(delete(models.RefreshToken).where(
+        models.RefreshToken.user_id == user.id,
+        models.RefreshToken.expires_at < datetime.utcnow()
+    ))
+    refresh_token = create_refresh_token(db, user.id)
+    await db.commit()
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """Obtener usuario actual desde el token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,18 +138,25 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    username = token_cache.get(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = schemas.TokenData(username=username)
+        except JWTError:
             raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
+        # El token no puede quedar en caché más allá de su expiración
+        token_cache.set(token, token_data.username, ttl=payload.get("exp", 0) - time.time())
     
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    user = await get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
+    # La caché se invalida al desactivar, así que el siguiente request ya lo ve inactivo
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
 async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
@@ -97,11 +175,11 @@ async def get_admin_user(current_user: schemas.User = Depends(get_current_active
     return current_user
 
 @router.post("/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """Registrar nuevo usuario"""
     
     # Verificar si el usuario ya existe
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User).where(models.User.username == user.username))
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -109,7 +187,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
     
     # Verificar si el email ya existe
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -117,10 +195,10 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
     
     # Verificar si es el primer usuario (será admin automáticamente)
-    user_count = db.query(models.User).count()
+    user_count = await db.scalar(select(func.count(models.User.id)))
     is_first_user = user_count == 0
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -132,17 +210,17 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Iniciar sesión y obtener token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -150,16 +228,12 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await issue_tokens(db, user)
 
 @router.post("/login")
-def login(
+async def login(
     login_data: schemas.LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint de login para el frontend (alternativo a /token)"""
     email = login_data.email
@@ -171,21 +245,17 @@ def login(
             detail="Email and password are required"
         )
     
-    user = authenticate_user(db, email, password)
+    user = await authenticate_user(db, email, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    tokens = await issue_tokens(db, user)
     
     return {
-        "access_token": access_token, 
-        "token_type": "bearer",
+        **tokens,
         "user": {
             "id": user.id,
             "username": user.username,
@@ -195,34 +265,95 @@ def login(
         }
     }
 
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_access_token(
+    refresh_request: schemas.RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Renovar el access token sin contraseña (el refresh token usado se rota)"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    row = (await db.execute(
+        select(models.RefreshToken, models.User).join(models.User).where(
+            models.RefreshToken.token_hash == hash_refresh_token(refresh_request.refresh_token),
+            models.RefreshToken.expires_at > datetime.utcnow()
+        )
+    )).first()
+    if row is None:
+        raise credentials_exception
+    stored_token, user = row
+    
+    # Revocar el token usado de forma atómica: si ya estaba revocado es una reutilización
+    result = await db.execute(update(models.RefreshToken).where(
+        models.RefreshToken.id == stored_token.id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=datetime.utcnow()))
+    if result.rowcount != 1:
+        # Posible robo del token: invalidar toda la cadena de ese login
+        await revoke_refresh_tokens(db, models.RefreshToken.family_id == stored_token.family_id)
+        await db.commit()
+        raise credentials_exception
+    
+    if not user.is_active:
+        await db.commit()
+        raise credentials_exception
+    
+    refresh_token = create_refresh_token(db, user.id, stored_token.family_id)
+    await db.commit()
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout")
+async def logout(
+    refresh_request: schemas.RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Cerrar sesión revocando la cadena de refresh tokens del login"""
+    family_id = await db.scalar(select(models.RefreshToken.family_id).where(
+        models.RefreshToken.token_hash == hash_refresh_token(refresh_request.refresh_token)
+    ))
+    if family_id:
+        await revoke_refresh_tokens(db, models.RefreshToken.family_id == family_id)
+        await db.commit()
+    
+    return {"message": "Logged out successfully"}
+
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(get_current_active_user)):
+async def read_users_me(current_user: schemas.User = Depends(get_current_active_user)):
     """Obtener información del usuario actual"""
     return current_user
 
 @router.put("/me", response_model=schemas.User)
-def update_user_me(
+async def update_user_me(
     user_update: schemas.UserUpdate,
     current_user: schemas.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar información del usuario actual"""
     
     # Verificar email único si se está actualizando
     if user_update.email and user_update.email != current_user.email:
-        existing_user = db.query(models.User).filter(
+        existing_user = await db.scalar(select(models.User).where(
             models.User.email == user_update.email,
             models.User.id != current_user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already in use")
     
     # Verificar username único si se está actualizando
     if user_update.username and user_update.username != current_user.username:
-        existing_user = db.query(models.User).filter(
+        existing_user = await db.scalar(select(models.User).where(
             models.User.username == user_update.username,
             models.User.id != current_user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(status_code=400, detail="Username already in use")
     
@@ -234,76 +365,93 @@ def update_user_me(
                 detail="Cannot change role without admin privileges"
             )
     
+    previous_username = current_user.username
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
     current_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_user_cache(previous_username, current_user.username)
+    await db.refresh(current_user)
     return current_user
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     current_password: str,
     new_password: str,
     current_user: schemas.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Cambiar contraseña del usuario actual"""
     
     # Verificar contraseña actual
-    if not verify_password(current_password, current_user.hashed_password):
+    if not await verify_password(current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
     # Actualizar contraseña
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = await get_password_hash(new_password)
     current_user.updated_at = datetime.utcnow()
-    db.commit()
+    # Cerrar las demás sesiones: los refresh tokens emitidos dejan de ser válidos
+    await revoke_refresh_tokens(db, models.RefreshToken.user_id == current_user.id)
+    await db.commit()
+    invalidate_user_cache(current_user.username)
     
     return {"message": "Password changed successfully"}
 
 # Endpoints administrativos
+# Columnas disponibles para fields= (nunca hashed_password)
+USER_FIELDS = schema_columns(schemas.User, models.User)
+
 @router.get("/users", response_model=list[schemas.User])
-def list_users(
+async def list_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Proyección de columnas, p. ej. id,username,full_name"),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
 ):
     """Listar todos los usuarios (solo admins)"""
-    users = db.query(models.User).offset(skip).limit(limit).all()
+    query = select(models.User).offset(skip).limit(limit)
+    projection = parse_fields(fields, USER_FIELDS)
+    if projection is not None:
+        rows = (await db.execute(project(query, projection))).all()
+        return fields_response(rows, projection, response)
+    users = (await db.scalars(query)).all()
     return users
 
 @router.put("/users/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
 ):
     """Actualizar usuario (solo admins)"""
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    previous_username = user.username
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
     
     user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_user_cache(previous_username, user.username)
+    await db.refresh(user)
     return user
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
 ):
     """Eliminar usuario (solo admins)"""
@@ -314,13 +462,15 @@ def delete_user(
             detail="Cannot delete your own account"
         )
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Soft delete: marcar como inactivo
     user.is_active = False
     user.updated_at = datetime.utcnow()
-    db.commit()
+    await revoke_refresh_tokens(db, models.RefreshToken.user_id == user.id)
+    await db.commit()
+    invalidate_user_cache(user.username)
     
     return {"message": "User deactivated successfully"}
\ No newline at end of file
@@ -1,43 +1,58 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from typing import Optional
 from datetime import datetime, date, timedelta
-from decimal import Decimal
-from app.database import get_db
+from app.database import get_read_db, query_budget
+from app.date_ranges import day_start, month_dates, within
+from app.stats import as_decimal, count_where, fetch_stats, sum_where
+from app.revenue import BREAKDOWN_PATTERN, GRANULARITY_PATTERN, revenue_trends
 from app import models, schemas
 from app.routers.auth import get_current_user
 
 router = APIRouter()
 
-@router.get("/stats", response_model=schemas.DashboardStats)
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
+@router.get("/stats", response_model=schemas.DashboardStats, dependencies=[Depends(query_budget(4))])
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener estadísticas generales para el dashboard"""
     
-    # Contar socios
-    total_members = db.query(func.count(models.Member.id)).scalar() or 0
-    active_members = db.query(func.count(models.Member.id)).filter(
-        models.Member.is_active == True
-    ).scalar() or 0
+    # Una consulta por tabla con agregación condicional
+    members = await fetch_stats(
+        db, models.Member,
+        total=count_where(),
+        active=count_where(models.Member.is_active == True)
+    )
+    total_members = members["total"]
+    active_members = members["active"]
     inactive_members = total_members - active_members
     
-    # Pagos de hoy
+    # Pagos verificados de hoy y del mes (rollup revenue_daily)
     today = date.today()
-    total_payments_today = db.query(func.sum(models.Payment.amount)).filter(
-        func.date(models.Payment.payment_date) == today,
-        models.Payment.is_verified == True
-    ).scalar() or Decimal('0')
+    rollup = models.RevenueDaily
+    revenue = await fetch_stats(
+        db, rollup,
+        within(rollup.day, month_dates(today.year, today.month)),
+        rollup.is_verified == True,
+        today=sum_where(rollup.amount, rollup.day == today),
+        month=sum_where(rollup.amount)
+    )
+    total_payments_today = as_decimal(revenue["today"])
+    total_payments_month = as_decimal(revenue["month"])
     
-    # Pagos del mes actual
-    current_year = today.year
-    current_month = today.month
-    total_payments_month = db.query(func.sum(models.Payment.amount)).filter(
-        extract('year', models.Payment.payment_date) == current_year,
-        extract('month', models.Payment.payment_date) == current_month,
-        models.Payment.is_verified == True
-    ).scalar() or Decimal('0')
+    # Asistencias de hoy y del mes (rango sobre el índice de checked_in_at)
+    today_start = day_start(today)
+    attendance = await fetch_stats(
+        db, models.Attendance,
+        models.Attendance.checked_in_at >= today_start.replace(day=1),
+        today=count_where(models.Attendance.checked_in_at >= today_start),
+        month=count_where()
+    )
+    attendance_today = attendance["today"]
+    attendance_month = attendance["month"]
     
     return schemas.DashboardStats(
         total_members=total_members,
@@ -45,30 +60,30 @@ def get_dashboard_stats(
         inactive_members=inactive_members,
         total_payments_today=total_payments_today,
         total_payments_month=total_payments_month,
-        attendance_today=0,
-        attendance_month=0
+        attendance_today=attendance_today,
+        attendance_month=attendance_month
     )
 
 @router.get("/membership-types", response_model=list[schemas.MembershipTypeStats])
-def get_membership_type_stats(
-    db: Session = Depends(get_db),
+async def get_membership_type_stats(
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener estadísticas por tipo de membresía"""
     
-    total_members = db.query(func.count(models.Member.id)).filter(
+    total_members = await db.scalar(select(func.count(models.Member.id)).where(
         models.Member.is_active == True
-    ).scalar() or 0
+    )) or 0
     
     if total_members == 0:
         return []
     
-    membership_stats = db.query(
+    membership_stats = (await db.execute(select(
         models.Member.membership_type,
         func.count(models.Member.id).label('count')
-    ).filter(
+    ).where(
         models.Member.is_active == True
-    ).group_by(models.Member.membership_type).all()
+    ).group_by(models.Member.membership_type))).all()
     
     result = []
     for membership_type, count in membership_stats:
@@ -81,28 +96,47 @@ def get_membership_type_stats(
     
     return result
 
-@router.get("/recent-activity")
-def get_recent_activity(
+@router.get("/recent-activity", dependencies=[Depends(query_budget(4))])
+async def get_recent_activity(
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener actividad reciente del gimnasio"""
     
     # Últimos pagos
-    recent_payments = db.query(models.Payment).join(models.Member).filter(
+    recent_payments = (await db.scalars(select(models.Payment).join(models.Member).options(
+        contains_eager(models.Payment.member)
+    ).where(
         models.Member.is_active == True
-    ).order_by(models.Payment.payment_date.desc()).limit(limit).all()
+    ).order_by(models.Payment.payment_date.desc()).limit(limit))).all()
+    
+    # Últimos check-ins
+    recent_checkins = (await db.execute(select(
+        models.Attendance.checked_in_at,
+        models.Member.first_name,
+        models.Member.last_name,
+        models.Member.membership_number
+    ).join(models.Member).order_by(models.Attendance.checked_in_at.desc()).limit(limit))).all()
     
     # Nuevos socios (últimos 7 días)
     week_ago = date.today() - timedelta(days=7)
-    new_members = db.query(models.Member).filter(
-        func.date(models.Member.created_at) >= week_ago,
+    new_members = (await db.scalars(select(models.Member).options(
+        joinedload(models.Member.membership_plan)
+    ).where(
+        models.Member.created_at >= day_start(week_ago),
         models.Member.is_active == True
-    ).order_by(models.Member.created_at.desc()).all()
+    ).order_by(models.Member.created_at.desc()))).all()
     
     return {
-        "recent_checkins": [],
+        "recent_checkins": [
+            {
+                "member_name": f"{checkin.first_name} {checkin.last_name}",
+                "membership_number": checkin.membership_number,
+                "checked_in_at": checkin.checked_in_at
+            }
+            for checkin in recent_checkins
+        ],
         "recent_payments": [
             {
                 "member_name": f"{pay.member.first_name} {pay.member.last_name}",
@@ -117,48 +151,26 @@ def get_recent_activity(
             {
                 "name": f"{member.first_name} {member.last_name}",
                 "membership_number": member.membership_number,
-                "membership_type": member.membership_type,
+                "membership_type": member.membership_plan.name if member.membership_plan else None,
                 "created_at": member.created_at
             }
             for member in new_members
         ]
     }
 
-@router.get("/revenue-trends")
-def get_revenue_trends(
-    months: int = 12,
-    db: Session = Depends(get_db),
+@router.get("/revenue-trends", dependencies=[Depends(query_budget(2))])
+async def get_revenue_trends(
+    months: int = Query(12, ge=1, le=120),
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+    breakdown: Optional[str] = Query(None, pattern=BREAKDOWN_PATTERN),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    """Obtener tendencias de ingresos por mes"""
-    
-    current_date = date.today()
-    current_year = current_date.year
-    current_month = current_date.month
+    """Obtener tendencias de ingresos por día, semana o mes de los últimos `months` meses"""
     
-    # Calcular meses a incluir
-    result = []
-    for i in range(months):
-        month = current_month - i
-        year = current_year
-        
-        if month <= 0:
-            month += 12
-            year -= 1
-        
-        # Calcular ingresos del mes
-        monthly_revenue = db.query(func.sum(models.Payment.amount)).filter(
-            extract('year', models.Payment.payment_date) == year,
-            extract('month', models.Payment.payment_date) == month,
-            models.Payment.is_verified == True
-        ).scalar() or Decimal('0')
-        
-        result.append({
-            "year": year,
-            "month": month,
-            "revenue": float(monthly_revenue)
-        })
+    today = date.today()
+    # Desde el primer día del mes más antiguo incluido
+    first_month = today.year * 12 + today.month - 1 - (months - 1)
+    start = date(first_month // 12, first_month % 12 + 1, 1)
     
-    # Ordenar por fecha (más antiguo primero)
-    result.reverse()
-    return result
\ No newline at end of file
+    return await revenue_trends(db, start, today, granularity, breakdown)
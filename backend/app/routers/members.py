@@ -1,48 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from sqlalchemy import select, func, and_, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, noload
 from typing import List, Optional
-from datetime import datetime, date
-from app.database import get_db
+from datetime import datetime, date, timedelta
+from app.database import get_db, get_read_db, query_budget
 from app import models, schemas
+from app.search import apply_member_search
+from app.pagination import decode_cursor, keyset_before, set_next_cursor
+from app.membership_numbers import membership_number_allocator
+from app.memberships import calculate_membership_end_date
+from app.member_import import MemberImporter, import_format, iter_records
+from app.export import EXPORT_FORMAT_PATTERN, export_response, select_export_columns
+from app.member_stats import member_stats_fields
+from app.fieldsets import fields_response, parse_fields, project, schema_columns
 from app.routers.auth import get_current_user
 
 router = APIRouter()
 
-def generate_membership_number(db: Session) -> str:
-    """Generar número de membresía único e incremental"""
-    current_year = datetime.now().year
-    
-    # Buscar el último número de socio del año actual
-    last_member = db.query(models.Member).filter(
-        models.Member.membership_number.like(f"GYM{current_year}%")
-    ).order_by(models.Member.membership_number.desc()).first()
-    
-    if last_member and last_member.membership_number:
-        # Extraer el número secuencial del último socio
-        try:
-            last_number = int(last_member.membership_number.replace(f"GYM{current_year}", ""))
-            next_number = last_number + 1
-        except ValueError:
-            # Si hay error en el formato, empezar desde 1
-            next_number = 1
-    else:
-        # Si no hay socios del año actual, empezar desde 1
-        next_number = 1
+def filter_members(query, is_active: Optional[bool] = None, membership_type: Optional[str] = None):
+    """Filtros comunes del listado y la exportación de socios"""
+    if is_active is not None:
+        query = query.where(models.Member.is_active == is_active)
     
-    # Formatear con ceros a la izquierda (4 dígitos)
-    return f"GYM{current_year}{next_number:04d}"
+    if membership_type:
+        query = query.where(models.Member.membership_type == membership_type)
+    
+    return query
 
 @router.post("/", response_model=schemas.Member, status_code=status.HTTP_201_CREATED)
-def create_member(
+async def create_member(
     member: schemas.MemberCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Crear nuevo socio"""
     
     # Verificar si el email ya existe
-    db_member = db.query(models.Member).filter(models.Member.email == member.email).first()
+    db_member = await db.scalar(select(models.Member).where(models.Member.email == member.email))
     if db_member:
         raise HTTPException(
             status_code=400,
@@ -50,7 +45,7 @@ def create_member(
         )
     
     # Verificar si el DNI ya existe
-    db_member_dni = db.query(models.Member).filter(models.Member.dni == member.dni).first()
+    db_member_dni = await db.scalar(select(models.Member).where(models.Member.dni == member.dni))
     if db_member_dni:
         raise HTTPException(
             status_code=400,
@@ -60,183 +55,266 @@ def create_member(
     # Si no se proporciona número de membresía, generar uno automático
     membership_number = member.membership_number
     if not membership_number:
-        membership_number = generate_membership_number(db)
-        # Con el nuevo sistema incremental, no necesitamos verificar duplicados
-        # ya que la función garantiza unicidad
+        # El contador por año asigna números de forma atómica, sin duplicados
+        membership_number = await membership_number_allocator.allocate()
     else:
         # Solo verificar duplicados si el usuario proporciona un número específico
-        db_member_num = db.query(models.Member).filter(
+        db_member_num = await db.scalar(select(models.Member).where(
             models.Member.membership_number == membership_number
-        ).first()
+        ))
         if db_member_num:
             raise HTTPException(
                 status_code=400,
                 detail="Membership number already exists"
             )
+        await membership_number_allocator.observe(membership_number)
     
     # Crear diccionario con todos los datos del miembro
     member_data = member.dict()
     member_data['membership_number'] = membership_number
     
     # Calcular automáticamente la fecha de fin de membresía (1 mes después de la fecha de inicio)
-    if 'membership_start_date' in member_data and member_data['membership_start_date']:
-        start_date = member_data['membership_start_date']
-        if isinstance(start_date, str):
-            from datetime import datetime
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        
-        # Calcular fecha de fin (1 mes después)
-        if start_date.month == 12:
-            end_date = start_date.replace(year=start_date.year + 1, month=1)
-        else:
-            end_date = start_date.replace(month=start_date.month + 1)
-        
-        member_data['membership_end_date'] = end_date
+    member_data['membership_end_date'] = calculate_membership_end_date(member.membership_start_date)
     
     db_member = models.Member(**member_data)
     db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
+    await db.commit()
+    await db.refresh(db_member)
     return db_member
 
-@router.get("/", response_model=List[schemas.Member])
-def list_members(
+@router.post("/import", response_model=schemas.MemberImportResult)
+async def import_members(
+    file: UploadFile = File(..., description="Archivo CSV (con encabezado) o NDJSON"),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Importar socios en lote desde un archivo CSV o NDJSON con reporte de errores por fila"""
+    
+    importer = MemberImporter(db)
+    return await importer.run(iter_records(file.file, import_format(file)))
+
+# Columnas disponibles para fields=
+MEMBER_FIELDS = schema_columns(schemas.Member, models.Member)
+
+# Relaciones que se pueden embeber con include=
+MEMBER_INCLUDES = {
+    "plan": models.Member.membership_plan,
+    "trainer": models.Member.trainer,
+}
+
+def member_load_options(include: Optional[str]) -> list:
+    """joinedload para las relaciones pedidas y noload para el resto (una sola consulta)"""
+    names = {name.strip() for name in (include or "").split(",") if name.strip()}
+    unknown = names - MEMBER_INCLUDES.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return [
+        joinedload(relationship) if name in names else noload(relationship)
+        for name, relationship in MEMBER_INCLUDES.items()
+    ]
+
+@router.get("/", response_model=List[schemas.MemberWithRelations], dependencies=[Depends(query_budget(2))])
+async def list_members(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor de la página siguiente (header X-Next-Cursor)"),
     is_active: Optional[bool] = Query(None),
     membership_type: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    include: Optional[str] = Query(None, description="Relaciones a embeber: plan, trainer"),
+    fields: Optional[str] = Query(None, description="Proyección de columnas, p. ej. id,first_name,last_name"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    """Listar socios con filtros opcionales"""
+    """Listar socios con filtros opcionales (paginación por offset o por cursor)"""
     
-    query = db.query(models.Member)
+    projection = parse_fields(fields, MEMBER_FIELDS)
+    if projection is not None and include:
+        raise HTTPException(status_code=400, detail="fields and include cannot be combined")
     
-    # Filtros
-    if is_active is not None:
-        query = query.filter(models.Member.is_active == is_active)
+    query = filter_members(select(models.Member), is_active, membership_type)
     
-    if membership_type:
-        query = query.filter(models.Member.membership_type == membership_type)
+    if after:
+        # Paginación por cursor: orden estable por id, sin OFFSET
+        (after_id,) = decode_cursor(after, int)
+        if search:
+            query = apply_member_search(query, search).order_by(None)
+        query = query.where(models.Member.id > after_id).order_by(models.Member.id).limit(limit)
+    elif search:
+        # Búsqueda indexada (FTS5 / pg_trgm) ordenada por relevancia
+        query = apply_member_search(query, search).offset(skip).limit(limit)
+    else:
+        query = query.order_by(models.Member.id).offset(skip).limit(limit)
     
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            models.Member.first_name.ilike(search_filter) |
-            models.Member.last_name.ilike(search_filter) |
-            models.Member.email.ilike(search_filter) |
-            models.Member.dni.ilike(search_filter) |
-            models.Member.membership_number.ilike(search_filter)
-        )
+    if projection is not None:
+        # Solo las columnas pedidas, sin objetos ORM ni validación del schema completo
+        rows = (await db.execute(project(query, projection, models.Member.id))).all()
+        if after or not search:
+            set_next_cursor(response, rows, limit, "key_id")
+        return fields_response(rows, projection, response)
     
-    members = query.offset(skip).limit(limit).all()
+    members = (await db.scalars(query.options(*member_load_options(include)))).all()
+    if after or not search:
+        set_next_cursor(response, members, limit, "id")
     return members
 
-@router.get("/{member_id}", response_model=schemas.MemberWithStats)
-def get_member(
+@router.get("/expiring", response_model=List[schemas.Member], dependencies=[Depends(query_budget(2))])
+async def list_expiring_members(
+    days: int = Query(7, ge=0, le=365),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Socios activos cuya membresía vence en los próximos `days` días"""
+    
+    today = date.today()
+    query = select(models.Member).where(
+        models.Member.membership_end_date.between(today, today + timedelta(days=days)),
+        models.Member.is_active == True
+    ).order_by(models.Member.membership_end_date, models.Member.id).limit(limit)
+    
+    return (await db.scalars(query)).all()
+
+MEMBER_EXPORT_COLUMNS = {column.name: column for column in models.Member.__table__.columns}
+
+@router.get("/export")
+async def export_members(
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    columns: Optional[str] = Query(None, description="Columnas separadas por coma (por defecto todas)"),
+    is_active: Optional[bool] = Query(None),
+    membership_type: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Exportar socios en CSV o NDJSON (streaming, mismos filtros que el listado)"""
+    
+    query = filter_members(select(models.Member), is_active, membership_type)
+    if search:
+        query = apply_member_search(query, search).order_by(None)
+    query = query.order_by(models.Member.id)
+    
+    return export_response(
+        db, query, select_export_columns(MEMBER_EXPORT_COLUMNS, columns), export_format, "members"
+    )
+
+@router.get("/{member_id}", response_model=schemas.MemberWithStats, dependencies=[Depends(query_budget(4))])
+async def get_member(
     member_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener socio por ID con estadísticas"""
     
-    member = db.query(models.Member).filter(models.Member.id == member_id).first()
+    member = await db.get(models.Member, member_id)
     if member is None:
         raise HTTPException(status_code=404, detail="Member not found")
     
-    # Calcular estadísticas
-    total_payments = db.query(func.sum(models.Payment.amount)).filter(
-        models.Payment.member_id == member_id,
-        models.Payment.is_verified == True
-    ).scalar() or 0
+    # Estadísticas precalculadas (read model member_stats)
+    member_stats = await db.get(models.MemberStats, member_id)
+    
+    # Visitas: rango del índice (member_id, checked_in_at)
+    total_visits, last_visit = (await db.execute(select(
+        func.count(models.Attendance.id), func.max(models.Attendance.checked_in_at)
+    ).where(models.Attendance.member_id == member_id))).one()
     
     # Convertir a dict y agregar estadísticas
     member_dict = member.__dict__.copy()
+    member_dict.update(member_stats_fields(member_stats))
     member_dict.update({
-        "total_payments": total_payments,
-        "total_visits": 0,
-        "last_visit": None
+        "total_visits": total_visits,
+        "last_visit": last_visit
     })
     
     return member_dict
 
 @router.put("/{member_id}", response_model=schemas.Member)
-def update_member(
+async def update_member(
     member_id: int, 
     member_update: schemas.MemberUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Actualizar socio"""
     
-    db_member = db.query(models.Member).filter(models.Member.id == member_id).first()
+    db_member = await db.get(models.Member, member_id)
     if db_member is None:
         raise HTTPException(status_code=404, detail="Member not found")
     
     # Verificar email único si se está actualizando
     if member_update.email and member_update.email != db_member.email:
-        existing_member = db.query(models.Member).filter(
+        existing_member = await db.scalar(select(models.Member).where(
             models.Member.email == member_update.email,
             models.Member.id != member_id
-        ).first()
+        ))
         if existing_member:
             raise HTTPException(status_code=400, detail="Email already in use")
     
     # Verificar número de membresía único si se está actualizando
     if member_update.membership_number and member_update.membership_number != db_member.membership_number:
-        existing_member = db.query(models.Member).filter(
+        existing_member = await db.scalar(select(models.Member).where(
             models.Member.membership_number == member_update.membership_number,
             models.Member.id != member_id
-        ).first()
+        ))
         if existing_member:
             raise HTTPException(status_code=400, detail="Membership number already in use")
+        await membership_number_allocator.observe(member_update.membership_number)
     
     update_data = member_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_member, field, value)
     
     db_member.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_member)
+    await db.commit()
+    await db.refresh(db_member)
     return db_member
 
 @router.delete("/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_member(
+async def delete_member(
     member_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Eliminar socio (soft delete)"""
     
-    member = db.query(models.Member).filter(models.Member.id == member_id).first()
+    member = await db.get(models.Member, member_id)
     if member is None:
         raise HTTPException(status_code=404, detail="Member not found")
     
     # Soft delete: marcar como inactivo en lugar de eliminar
     member.is_active = False
     member.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     return {"message": "Member deactivated successfully"}
 
-@router.get("/{member_id}/payments", response_model=List[schemas.Payment])
-def get_member_payments(
+@router.get("/{member_id}/payments", response_model=List[schemas.Payment], dependencies=[Depends(query_budget(3))])
+async def get_member_payments(
     member_id: int,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor de la página siguiente (header X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener historial de pagos de un socio"""
     
     # Verificar que el socio existe
-    member = db.query(models.Member).filter(models.Member.id == member_id).first()
+    member = await db.get(models.Member, member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
     
-    payments = db.query(models.Payment).filter(
+    query = select(models.Payment).where(
         models.Payment.member_id == member_id
-    ).order_by(models.Payment.payment_date.desc()).offset(skip).limit(limit).all()
+    ).order_by(models.Payment.payment_date.desc(), models.Payment.id.desc())
+    
+    if after:
+        query = query.where(keyset_before(models.Payment.payment_date, models.Payment.id, after))
+    else:
+        query = query.offset(skip)
     
+    payments = (await db.scalars(query.limit(limit))).all()
+    set_next_cursor(response, payments, limit, "payment_date", "id")
     return payments
\ No newline at end of file
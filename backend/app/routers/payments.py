@@ -1,25 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
-from typing import List, Optional
-from datetime import datetime, date
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from typing import Any, List, Optional
+from datetime import datetime, date, timedelta
 from decimal import Decimal
-from app.database import get_db
+from app.database import get_db, get_read_db, query_budget
 from app import models, schemas
 from app.routers.auth import get_current_user
+from app.date_ranges import day_start, month_dates, within
+from app.pagination import keyset_before, set_next_cursor
+from app.export import EXPORT_FORMAT_PATTERN, export_response, select_export_columns
+from app.member_stats import apply_payment_change, payment_state, refresh_member_stats
+from app.revenue_daily import apply_revenue_change, refresh_revenue_daily
+from app.payment_batch import PAYMENT_BULK_MAX_ITEMS, create_payments_bulk
+from app.stats import as_decimal, fetch_stats, stats_select, sum_where
+from app.fieldsets import fields_response, parse_fields, project, schema_columns
+import os
 
 router = APIRouter()
 
+# Máximo de ids por pedido de verificación masiva (con filtros no hay límite)
+BULK_VERIFY_MAX_IDS = int(os.getenv("BULK_VERIFY_MAX_IDS", "10000"))
+
+# Columnas disponibles para fields= (las del socio con prefijo "member.")
+PAYMENT_FIELDS = {
+    **schema_columns(schemas.Payment, models.Payment),
+    **schema_columns(schemas.Member, models.Member, prefix="member."),
+}
+
+def filter_payments(
+    query,
+    is_verified: Optional[bool] = None,
+    payment_method: Optional[str] = None,
+    payment_concept: Optional[str] = None,
+    member_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Filtros comunes del listado y la exportación de pagos"""
+    if is_verified is not None:
+        query = query.where(models.Payment.is_verified == is_verified)
+    
+    if payment_method:
+        query = query.where(models.Payment.payment_method == payment_method)
+    
+    if payment_concept:
+        query = query.where(models.Payment.payment_concept == payment_concept)
+    
+    if member_id:
+        query = query.where(models.Payment.member_id == member_id)
+    
+    # Rango semiabierto: end_date incluye todo ese día
+    if start_date:
+        query = query.where(models.Payment.payment_date >= day_start(start_date))
+    
+    if end_date:
+        query = query.where(models.Payment.payment_date < day_start(end_date + timedelta(days=1)))
+    
+    return query
+
 @router.post("/", response_model=schemas.Payment, status_code=status.HTTP_201_CREATED)
-def create_payment(
+async def create_payment(
     payment: schemas.PaymentCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Registrar nuevo pago"""
     
     # Verificar que el socio existe
-    member = db.query(models.Member).filter(models.Member.id == payment.member_id).first()
+    member = await db.get(models.Member, payment.member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
     
@@ -29,63 +79,118 @@ def create_payment(
     
     db_payment = models.Payment(**payment.dict())
     db.add(db_payment)
-    db.commit()
-    db.refresh(db_payment)
+    await apply_payment_change(db, None, db_payment)
+    await apply_revenue_change(db, None, db_payment)
+    await db.commit()
+    await db.refresh(db_payment)
     return db_payment
 
-@router.get("/", response_model=List[schemas.PaymentWithMember])
-def list_payments(
+@router.post("/bulk", response_model=schemas.PaymentBulkResult, dependencies=[Depends(query_budget(7))])
+async def create_payments_batch(
+    items: List[Any] = Body(..., description=f"Pagos a registrar (hasta {PAYMENT_BULK_MAX_ITEMS})"),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Registrar muchos pagos en una sola transacción con reporte de errores por ítem"""
+    
+    if len(items) > PAYMENT_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {PAYMENT_BULK_MAX_ITEMS} payments per request")
+    
+    return await create_payments_bulk(db, items)
+
+@router.get("/", response_model=List[schemas.PaymentWithMember], dependencies=[Depends(query_budget(2))])
+async def list_payments(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor de la página siguiente (header X-Next-Cursor)"),
     is_verified: Optional[bool] = Query(None),
     payment_method: Optional[str] = Query(None),
     payment_concept: Optional[str] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     member_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Proyección de columnas, p. ej. id,amount,member.last_name"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    """Listar pagos con filtros opcionales"""
+    """Listar pagos con filtros opcionales (paginación por offset o por cursor)"""
     
-    query = db.query(models.Payment).join(models.Member)
+    projection = parse_fields(fields, PAYMENT_FIELDS)
+    query = select(models.Payment).join(models.Member)
     
-    # Filtros
-    if is_verified is not None:
-        query = query.filter(models.Payment.is_verified == is_verified)
+    query = filter_payments(
+        query, is_verified, payment_method, payment_concept, member_id, start_date, end_date
+    )
     
-    if payment_method:
-        query = query.filter(models.Payment.payment_method == payment_method)
+    # El id desempata pagos con la misma fecha para que el orden sea estable
+    query = query.order_by(models.Payment.payment_date.desc(), models.Payment.id.desc())
     
-    if payment_concept:
-        query = query.filter(models.Payment.payment_concept == payment_concept)
+    if after:
+        # Paginación por cursor: continúa después del último pago visto, sin OFFSET
+        query = query.where(keyset_before(models.Payment.payment_date, models.Payment.id, after))
+    else:
+        query = query.offset(skip)
     
-    if member_id:
-        query = query.filter(models.Payment.member_id == member_id)
+    query = query.limit(limit)
     
-    if start_date:
-        query = query.filter(models.Payment.payment_date >= start_date)
+    if projection is not None:
+        # Solo las columnas pedidas, sin objetos ORM ni validación del schema completo
+        rows = (await db.execute(
+            project(query, projection, models.Payment.payment_date, models.Payment.id)
+        )).all()
+        set_next_cursor(response, rows, limit, "key_payment_date", "key_id")
+        return fields_response(rows, projection, response)
     
-    if end_date:
-        query = query.filter(models.Payment.payment_date <= end_date)
+    payments = (await db.scalars(query.options(contains_eager(models.Payment.member)))).all()
+    set_next_cursor(response, payments, limit, "payment_date", "id")
+    return payments
+
+PAYMENT_EXPORT_COLUMNS = {
+    **{column.name: column for column in models.Payment.__table__.columns},
+    "member_membership_number": models.Member.membership_number,
+    "member_first_name": models.Member.first_name,
+    "member_last_name": models.Member.last_name,
+    "member_dni": models.Member.dni,
+}
+
+@router.get("/export")
+async def export_payments(
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    columns: Optional[str] = Query(None, description="Columnas separadas por coma (por defecto todas)"),
+    is_verified: Optional[bool] = Query(None),
+    payment_method: Optional[str] = Query(None),
+    payment_concept: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    member_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Exportar pagos en CSV o NDJSON (streaming, mismos filtros que el listado)"""
     
-    payments = query.order_by(
-        models.Payment.payment_date.desc()
-    ).offset(skip).limit(limit).all()
+    query = filter_payments(
+        select(models.Payment).join(models.Member),
+        is_verified, payment_method, payment_concept, member_id, start_date, end_date
+    ).order_by(models.Payment.payment_date.desc(), models.Payment.id.desc())
     
-    return payments
+    return export_response(
+        db, query, select_export_columns(PAYMENT_EXPORT_COLUMNS, columns), export_format, "payments"
+    )
 
-@router.get("/{payment_id}", response_model=schemas.PaymentWithMember)
-def get_payment(
+@router.get("/{payment_id}", response_model=schemas.PaymentWithMember, dependencies=[Depends(query_budget(2))])
+async def get_payment(
     payment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener pago por ID"""
     
-    payment = db.query(models.Payment).join(models.Member).filter(
+    payment = await db.scalar(select(models.Payment).join(models.Member).options(
+        contains_eager(models.Payment.member)
+    ).where(
         models.Payment.id == payment_id
-    ).first()
+    ))
     
     if payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
@@ -93,81 +198,159 @@ def get_payment(
     return payment
 
 @router.put("/{payment_id}", response_model=schemas.Payment)
-def update_payment(
+async def update_payment(
     payment_id: int,
     payment_update: schemas.PaymentUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Actualizar pago"""
     
-    db_payment = db.query(models.Payment).filter(models.Payment.id == payment_id).first()
+    db_payment = await db.get(models.Payment, payment_id)
     if db_payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
+    before = payment_state(db_payment)
     update_data = payment_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_payment, field, value)
     
-    db.commit()
-    db.refresh(db_payment)
+    await apply_payment_change(db, before, db_payment)
+    await apply_revenue_change(db, before, db_payment)
+    await db.commit()
+    await db.refresh(db_payment)
     return db_payment
 
 @router.put("/{payment_id}/verify", response_model=schemas.Payment)
-def verify_payment(
+async def verify_payment(
     payment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Verificar pago"""
     
-    payment = db.query(models.Payment).filter(models.Payment.id == payment_id).first()
+    payment = await db.get(models.Payment, payment_id)
     if payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
     if payment.is_verified:
         raise HTTPException(status_code=400, detail="Payment already verified")
     
+    before = payment_state(payment)
     payment.is_verified = True
     payment.verified_by = current_user.id
     payment.verified_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(payment)
+    await apply_payment_change(db, before, payment)
+    await apply_revenue_change(db, before, payment)
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
 @router.put("/{payment_id}/unverify", response_model=schemas.Payment)
-def unverify_payment(
+async def unverify_payment(
     payment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Desverificar pago"""
     
-    payment = db.query(models.Payment).filter(models.Payment.id == payment_id).first()
+    payment = await db.get(models.Payment, payment_id)
     if payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
     if not payment.is_verified:
         raise HTTPException(status_code=400, detail="Payment is not verified")
     
+    before = payment_state(payment)
     payment.is_verified = False
     payment.verified_by = None
     payment.verified_at = None
     
-    db.commit()
-    db.refresh(payment)
+    await apply_payment_change(db, before, payment)
+    await apply_revenue_change(db, before, payment)
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
+async def set_verified_bulk(
+    db: AsyncSession,
+    selection: schemas.PaymentBulkVerification,
+    verified: bool,
+    current_user: schemas.User
+) -> schemas.PaymentBulkVerificationResult:
+    """Cambiar el estado de verificación de varios pagos con un único UPDATE"""
+    
+    filters = selection.dict(exclude={"ids"}, exclude_none=True)
+    if selection.ids is None and not filters:
+        raise HTTPException(status_code=400, detail="Provide payment ids or at least one filter")
+    if selection.ids is not None and len(selection.ids) > BULK_VERIFY_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_VERIFY_MAX_IDS} payment ids per request")
+    
+    target = select(models.Payment.id)
+    if selection.ids is not None:
+        target = target.where(models.Payment.id.in_(set(selection.ids)))
+    target = filter_payments(target, **filters)
+    
+    # Estado actual de los pagos alcanzados: para informar omitidos y recalcular agregados
+    rows = (await db.execute(target.add_columns(
+        models.Payment.member_id, models.Payment.payment_date, models.Payment.is_verified
+    ))).all()
+    changed = [row for row in rows if bool(row.is_verified) != verified]
+    skipped_ids = sorted(row.id for row in rows if bool(row.is_verified) == verified)
+    missing_ids = sorted(set(selection.ids or []) - {row.id for row in rows})
+    
+    if changed:
+        # Mismo criterio que la selección, así con filtros no hay límite de parámetros
+        await db.execute(update(models.Payment).where(
+            models.Payment.id.in_(target.scalar_subquery()),
+            models.Payment.is_verified == (not verified)
+        ).values(
+            is_verified=verified,
+            verified_by=current_user.id if verified else None,
+            verified_at=datetime.utcnow() if verified else None
+        ).execution_options(synchronize_session=False))
+        # Agregados derivados en la misma transacción: solo socios y días afectados
+        await refresh_member_stats(db, {row.member_id for row in changed})
+        await refresh_revenue_daily(db, {row.payment_date.date() for row in changed})
+        await db.commit()
+    
+    return schemas.PaymentBulkVerificationResult(
+        updated=len(changed),
+        updated_ids=sorted(row.id for row in changed),
+        skipped_ids=skipped_ids,
+        missing_ids=missing_ids
+    )
+
+@router.post("/bulk-verify", response_model=schemas.PaymentBulkVerificationResult,
+             dependencies=[Depends(query_budget(7))])
+async def bulk_verify_payments(
+    selection: schemas.PaymentBulkVerification,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Verificar varios pagos por ids o filtros (conciliación de fin de mes)"""
+    return await set_verified_bulk(db, selection, True, current_user)
+
+@router.post("/bulk-unverify", response_model=schemas.PaymentBulkVerificationResult,
+             dependencies=[Depends(query_budget(7))])
+async def bulk_unverify_payments(
+    selection: schemas.PaymentBulkVerification,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Desverificar varios pagos por ids o filtros"""
+    return await set_verified_bulk(db, selection, False, current_user)
+
 @router.delete("/{payment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_payment(
+async def delete_payment(
     payment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Eliminar pago"""
     
-    payment = db.query(models.Payment).filter(models.Payment.id == payment_id).first()
+    payment = await db.get(models.Payment, payment_id)
     if payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
@@ -178,80 +361,76 @@ def delete_payment(
             detail="Cannot delete verified payment. Unverify first."
         )
     
-    db.delete(payment)
-    db.commit()
+    before = payment_state(payment)
+    await db.delete(payment)
+    await apply_payment_change(db, before, None)
+    await apply_revenue_change(db, before, None)
+    await db.commit()
     
     return {"message": "Payment deleted successfully"}
 
-@router.get("/stats/today", response_model=dict)
-def get_today_payment_stats(
-    db: Session = Depends(get_db),
+@router.get("/stats/today", response_model=dict, dependencies=[Depends(query_budget(2))])
+async def get_today_payment_stats(
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener estadísticas de pagos del día"""
     
     today = date.today()
-    
-    # Total de pagos del día
-    total_amount = db.query(func.sum(models.Payment.amount)).filter(
-        func.date(models.Payment.payment_date) == today,
-        models.Payment.is_verified == True
-    ).scalar() or Decimal('0')
-    
-    # Cantidad de pagos
-    total_payments = db.query(func.count(models.Payment.id)).filter(
-        func.date(models.Payment.payment_date) == today
-    ).scalar() or 0
-    
-    # Pagos verificados
-    verified_payments = db.query(func.count(models.Payment.id)).filter(
-        func.date(models.Payment.payment_date) == today,
-        models.Payment.is_verified == True
-    ).scalar() or 0
+    rollup = models.RevenueDaily
+    verified = rollup.is_verified == True
+    
+    # Importe verificado, cantidad total y verificada en una sola pasada sobre el rollup
+    stats = await fetch_stats(
+        db, rollup,
+        rollup.day == today,
+        total_amount=sum_where(rollup.amount, verified),
+        total_payments=sum_where(rollup.payment_count),
+        verified_payments=sum_where(rollup.payment_count, verified)
+    )
+    total_payments = stats["total_payments"]
+    verified_payments = stats["verified_payments"]
     
     # Pagos pendientes
     pending_payments = total_payments - verified_payments
     
     return {
         "date": today,
-        "total_amount": float(total_amount),
+        "total_amount": float(stats["total_amount"]),
         "total_payments": total_payments,
         "verified_payments": verified_payments,
         "pending_payments": pending_payments
     }
 
-@router.get("/stats/month", response_model=dict)
-def get_month_payment_stats(
+@router.get("/stats/month", response_model=dict, dependencies=[Depends(query_budget(2))])
+async def get_month_payment_stats(
     year: int = Query(default=datetime.now().year),
     month: int = Query(default=datetime.now().month, ge=1, le=12),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Obtener estadísticas de pagos del mes"""
     
-    # Total de pagos del mes
-    total_amount = db.query(func.sum(models.Payment.amount)).filter(
-        extract('year', models.Payment.payment_date) == year,
-        extract('month', models.Payment.payment_date) == month,
-        models.Payment.is_verified == True
-    ).scalar() or Decimal('0')
-    
-    # Cantidad de pagos
-    total_payments = db.query(func.count(models.Payment.id)).filter(
-        extract('year', models.Payment.payment_date) == year,
-        extract('month', models.Payment.payment_date) == month
-    ).scalar() or 0
-    
-    # Pagos por método
-    payment_methods = db.query(
-        models.Payment.payment_method,
-        func.count(models.Payment.id).label('count'),
-        func.sum(models.Payment.amount).label('amount')
-    ).filter(
-        extract('year', models.Payment.payment_date) == year,
-        extract('month', models.Payment.payment_date) == month,
-        models.Payment.is_verified == True
-    ).group_by(models.Payment.payment_method).all()
+    rollup = models.RevenueDaily
+    verified = rollup.is_verified == True
+    
+    # Una fila por método; los totales del mes se suman en Python
+    by_method = (await db.execute(stats_select(
+        rollup,
+        within(rollup.day, month_dates(year, month)),
+        count=sum_where(rollup.payment_count, verified),
+        amount=sum_where(rollup.amount, verified),
+        total_payments=sum_where(rollup.payment_count)
+    ).add_columns(rollup.payment_method).group_by(rollup.payment_method))).all()
+    
+    total_amount = sum((as_decimal(row.amount) for row in by_method), Decimal('0'))
+    total_payments = sum(row.total_payments for row in by_method)
+    
+    # Pagos por método (solo verificados)
+    payment_methods = [
+        (row.payment_method, row.count, row.amount)
+        for row in by_method if row.count
+    ]
     
     return {
         "year": year,
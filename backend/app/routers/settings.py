@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_db, get_read_db
 from app import models, schemas
 from app.routers.auth import get_current_user
+from app.fieldsets import fields_response, parse_fields, project, schema_columns
 
 router = APIRouter(
     tags=["settings"],
@@ -13,9 +15,9 @@ router = APIRouter(
 # ====== CONFIGURACIÓN GENERAL DEL GIMNASIO ======
 
 @router.get("/gym", response_model=schemas.GymSettings)
-def get_gym_settings(db: Session = Depends(get_db)):
+async def get_gym_settings(db: AsyncSession = Depends(get_db)):
     """Obtener configuración general del gimnasio"""
-    settings = db.query(models.GymSettings).first()
+    settings = await db.scalar(select(models.GymSettings).limit(1))
     if not settings:
         # Crear configuración por defecto si no existe
         default_settings = models.GymSettings(
@@ -31,18 +33,18 @@ def get_gym_settings(db: Session = Depends(get_db)):
             logo_url=""
         )
         db.add(default_settings)
-        db.commit()
-        db.refresh(default_settings)
+        await db.commit()
+        await db.refresh(default_settings)
         return default_settings
     return settings
 
 @router.put("/gym", response_model=schemas.GymSettings)
-def update_gym_settings(
+async def update_gym_settings(
     settings_update: schemas.GymSettingsUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar configuración general del gimnasio"""
-    settings = db.query(models.GymSettings).first()
+    settings = await db.scalar(select(models.GymSettings).limit(1))
     if not settings:
         # Crear configuración si no existe
         settings_data = settings_update.model_dump(exclude_unset=True)
@@ -54,36 +56,36 @@ def update_gym_settings(
         for field, value in settings_data.items():
             setattr(settings, field, value)
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
     return settings
 
 # ====== HORARIOS ======
 
 @router.get("/schedules", response_model=List[schemas.Schedule])
-def get_schedules(db: Session = Depends(get_db)):
+async def get_schedules(db: AsyncSession = Depends(get_read_db)):
     """Obtener todos los horarios"""
-    schedules = db.query(models.Schedule).order_by(models.Schedule.day_of_week, models.Schedule.opening_time).all()
+    schedules = (await db.scalars(select(models.Schedule).order_by(models.Schedule.day_of_week, models.Schedule.opening_time))).all()
     return schedules
     
     return schedules
 
 @router.get("/schedules/day/{day}", response_model=List[schemas.Schedule])
-def get_schedules_by_day(day: int, db: Session = Depends(get_db)):
+async def get_schedules_by_day(day: int, db: AsyncSession = Depends(get_read_db)):
     """Obtener horarios de un día específico (0=Lunes, 1=Martes, ..., 6=Domingo)"""
     if day < 0 or day > 6:
         raise HTTPException(status_code=400, detail="Día inválido. Debe ser entre 0 (Lunes) y 6 (Domingo)")
     
-    schedules = db.query(models.Schedule).filter(
+    schedules = (await db.scalars(select(models.Schedule).where(
         models.Schedule.day_of_week == day
-    ).order_by(models.Schedule.opening_time).all()
+    ).order_by(models.Schedule.opening_time))).all()
     
     return schedules
 
 @router.post("/schedules", response_model=schemas.Schedule)
-def create_schedule(
+async def create_schedule(
     schedule_data: schemas.ScheduleCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Crear un nuevo horario"""
     # Validar formato de tiempo
@@ -103,10 +105,10 @@ def create_schedule(
         raise HTTPException(status_code=400, detail="Día inválido. Debe ser entre 0 (Lunes) y 6 (Domingo)")
     
     # Verificar solapamiento de horarios en el mismo día (solo advertencia para horarios con nombres diferentes)
-    existing_schedules = db.query(models.Schedule).filter(
+    existing_schedules = (await db.scalars(select(models.Schedule).where(
         models.Schedule.day_of_week == schedule_data.day_of_week,
         models.Schedule.is_open == True
-    ).all()
+    ))).all()
     
     for existing in existing_schedules:
         # Convertir strings a minutos para comparación más fácil
@@ -132,26 +134,26 @@ def create_schedule(
     
     schedule = models.Schedule(**schedule_data.model_dump())
     db.add(schedule)
-    db.commit()
-    db.refresh(schedule)
+    await db.commit()
+    await db.refresh(schedule)
     return schedule
 
 @router.get("/schedules/{schedule_id}", response_model=schemas.Schedule)
-def get_schedule(schedule_id: int, db: Session = Depends(get_db)):
+async def get_schedule(schedule_id: int, db: AsyncSession = Depends(get_read_db)):
     """Obtener un horario específico"""
-    schedule = db.query(models.Schedule).filter(models.Schedule.id == schedule_id).first()
+    schedule = await db.get(models.Schedule, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Horario no encontrado")
     return schedule
 
 @router.put("/schedules/{schedule_id}", response_model=schemas.Schedule)
-def update_schedule(
+async def update_schedule(
     schedule_id: int,
     schedule_update: schemas.ScheduleUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar un horario"""
-    schedule = db.query(models.Schedule).filter(models.Schedule.id == schedule_id).first()
+    schedule = await db.get(models.Schedule, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Horario no encontrado")
     
@@ -174,68 +176,89 @@ def update_schedule(
     for field, value in schedule_data.items():
         setattr(schedule, field, value)
     
-    db.commit()
-    db.refresh(schedule)
+    await db.commit()
+    await db.refresh(schedule)
     return schedule
 
 @router.delete("/schedules/{schedule_id}")
-def delete_schedule(schedule_id: int, db: Session = Depends(get_db)):
+async def delete_schedule(schedule_id: int, db: AsyncSession = Depends(get_db)):
     """Eliminar un horario"""
-    schedule = db.query(models.Schedule).filter(models.Schedule.id == schedule_id).first()
+    schedule = await db.get(models.Schedule, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Horario no encontrado")
     
-    db.delete(schedule)
-    db.commit()
+    await db.delete(schedule)
+    await db.commit()
     return {"message": "Horario eliminado exitosamente"}
 
 @router.delete("/schedules/clear/all")
-def clear_all_schedules(db: Session = Depends(get_db)):
+async def clear_all_schedules(db: AsyncSession = Depends(get_db)):
     """Eliminar todos los horarios (útil para empezar desde cero)"""
-    deleted_count = db.query(models.Schedule).delete()
-    db.commit()
+    result = await db.execute(delete(models.Schedule))
+    deleted_count = result.rowcount
+    await db.commit()
     return {"message": f"Se eliminaron {deleted_count} horarios"}
 
 # ====== PLANES DE MEMBRESÍA ======
 
+# Columnas disponibles para fields=
+PLAN_FIELDS = schema_columns(schemas.MembershipPlan, models.MembershipPlan)
+
+async def list_membership_plans(db: AsyncSession, query, fields: Optional[str], response: Response):
+    """Planes completos o solo las columnas pedidas en fields="""
+    projection = parse_fields(fields, PLAN_FIELDS)
+    if projection is not None:
+        rows = (await db.execute(project(query, projection))).all()
+        return fields_response(rows, projection, response)
+    return (await db.scalars(query)).all()
+
 @router.get("/membership-plans", response_model=List[schemas.MembershipPlan])
-def get_membership_plans(db: Session = Depends(get_db)):
+async def get_membership_plans(
+    response: Response,
+    fields: Optional[str] = Query(None, description="Proyección de columnas, p. ej. id,name,price"),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Obtener todos los planes de membresía"""
-    return db.query(models.MembershipPlan).filter(models.MembershipPlan.is_active == True).all()
+    query = select(models.MembershipPlan).where(models.MembershipPlan.is_active == True)
+    return await list_membership_plans(db, query, fields, response)
 
 @router.get("/membership-plans/all", response_model=List[schemas.MembershipPlan])
-def get_all_membership_plans(db: Session = Depends(get_db)):
+async def get_all_membership_plans(
+    response: Response,
+    fields: Optional[str] = Query(None, description="Proyección de columnas, p. ej. id,name,price"),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Obtener todos los planes de membresía (incluidos inactivos)"""
-    return db.query(models.MembershipPlan).all()
+    return await list_membership_plans(db, select(models.MembershipPlan), fields, response)
 
 @router.get("/membership-plans/{plan_id}", response_model=schemas.MembershipPlan)
-def get_membership_plan(plan_id: int, db: Session = Depends(get_db)):
+async def get_membership_plan(plan_id: int, db: AsyncSession = Depends(get_read_db)):
     """Obtener un plan de membresía específico"""
-    plan = db.query(models.MembershipPlan).filter(models.MembershipPlan.id == plan_id).first()
+    plan = await db.get(models.MembershipPlan, plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan de membresía no encontrado")
     return plan
 
 @router.post("/membership-plans", response_model=schemas.MembershipPlan)
-def create_membership_plan(
+async def create_membership_plan(
     plan: schemas.MembershipPlanCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Crear un nuevo plan de membresía"""
     db_plan = models.MembershipPlan(**plan.model_dump())
     db.add(db_plan)
-    db.commit()
-    db.refresh(db_plan)
+    await db.commit()
+    await db.refresh(db_plan)
     return db_plan
 
 @router.put("/membership-plans/{plan_id}", response_model=schemas.MembershipPlan)
-def update_membership_plan(
+async def update_membership_plan(
     plan_id: int,
     plan_update: schemas.MembershipPlanUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar un plan de membresía"""
-    plan = db.query(models.MembershipPlan).filter(models.MembershipPlan.id == plan_id).first()
+    plan = await db.get(models.MembershipPlan, plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan de membresía no encontrado")
     
@@ -243,17 +266,17 @@ def update_membership_plan(
     for field, value in plan_data.items():
         setattr(plan, field, value)
     
-    db.commit()
-    db.refresh(plan)
+    await db.commit()
+    await db.refresh(plan)
     return plan
 
 @router.delete("/membership-plans/{plan_id}")
-def delete_membership_plan(plan_id: int, db: Session = Depends(get_db)):
+async def delete_membership_plan(plan_id: int, db: AsyncSession = Depends(get_db)):
     """Eliminar un plan de membresía (soft delete)"""
-    plan = db.query(models.MembershipPlan).filter(models.MembershipPlan.id == plan_id).first()
+    plan = await db.get(models.MembershipPlan, plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan de membresía no encontrado")
     
     plan.is_active = False
-    db.commit()
+    await db.commit()
     return {"message": "Plan de membresía eliminado exitosamente"}
\ No newline at end of file
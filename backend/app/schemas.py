@@ -95,10 +95,29 @@ class Member(MemberBase):
         from_attributes = True
 
 class MemberWithStats(Member):
-    total_payments: Decimal = 0
+    total_payments: Decimal = 0  # Total de pagos verificados
+    payment_count: int = 0
+    outstanding_amount: Decimal = 0  # Pagos pendientes de verificar
+    last_payment_date: Optional[datetime] = None
+    last_verified_at: Optional[datetime] = None
     total_visits: int = 0
     last_visit: Optional[datetime] = None
 
+class MemberWithRelations(Member):
+    """Socio con relaciones embebidas a pedido (`include=plan,trainer`)"""
+    membership_plan: Optional["MembershipPlan"] = None
+    trainer: Optional[User] = None
+
+class MemberImportError(BaseModel):
+    row: int  # Número de registro en el archivo (sin contar el encabezado)
+    errors: List[str]
+
+class MemberImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[MemberImportError] = []
+
 # Esquemas para Payments
 class PaymentBase(BaseModel):
     member_id: int
@@ -133,6 +152,61 @@ class Payment(PaymentBase):
 class PaymentWithMember(Payment):
     member: Member
 
+class PaymentBulkError(BaseModel):
+    index: int  # Posición del pago en la lista enviada
+    errors: List[str]
+
+class PaymentBulkResult(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[PaymentBulkError] = []
+
+class PaymentBulkVerification(BaseModel):
+    """Pagos a (des)verificar: lista de ids y/o filtros (se requiere al menos uno)"""
+    ids: Optional[List[int]] = None
+    member_id: Optional[int] = None
+    payment_method: Optional[str] = None
+    payment_concept: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class PaymentBulkVerificationResult(BaseModel):
+    updated: int
+    updated_ids: List[int] = []
+    skipped_ids: List[int] = []  # Ya estaban en el estado pedido
+    missing_ids: List[int] = []  # Ids inexistentes o fuera de los filtros
+
+# Esquemas para asistencia
+class CheckInRequest(BaseModel):
+    identifier: str  # DNI o número de socio
+
+class CheckInResponse(BaseModel):
+    member_id: int
+    member_name: str
+    membership_number: str
+    checked_in_at: datetime
+    membership_end_date: date
+    days_remaining: int
+    days_per_week: Optional[int] = None
+    weekly_visits: Optional[int] = None  # Días usados esta semana (None si el plan no tiene cupo)
+
+class VisitQuota(BaseModel):
+    member_id: int
+    days_per_week: Optional[int] = None
+    days_used: int
+    visited_today: bool
+    can_enter: bool
+
+class Attendance(BaseModel):
+    id: int
+    member_id: int
+    checked_in_at: datetime
+    method: str
+    
+    class Config:
+        from_attributes = True
+
 # Esquemas para Auth
 class LoginRequest(BaseModel):
     email: str
@@ -141,6 +215,10 @@ class LoginRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -249,4 +327,6 @@ class MembershipPlan(MembershipPlanBase):
     updated_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+MemberWithRelations.model_rebuild()
@@ -0,0 +1,135 @@
+"""
+Búsqueda indexada de socios.
+
+- SQLite: tabla virtual FTS5 (external content sobre `members`) sincronizada por
+  triggers, con tokenizer unicode61 que ignora mayúsculas y acentos y con índices
+  de prefijo para buscar mientras se escribe.
+- PostgreSQL: índice GIN pg_trgm sobre una expresión normalizada con unaccent.
+
+Si el motor no soporta el índice se vuelve a los ILIKE originales.
+"""
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.engine import Engine
+from app import models
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Se determina en setup_member_search() según el motor y sus extensiones
+search_backend = "like"
+
+MEMBER_SEARCH_COLUMNS = ("first_name", "last_name", "email", "dni", "membership_number")
+
+members_fts = table("members_fts", column("rowid"), column("rank"))
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE members_fts USING fts5(
+        first_name, last_name, email, dni, membership_number,
+        content='members', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN
+        INSERT INTO members_fts(rowid, first_name, last_name, email, dni, membership_number)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.dni, new.membership_number);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN
+        INSERT INTO members_fts(members_fts, rowid, first_name, last_name, email, dni, membership_number)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.dni, old.membership_number);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS members_fts_update AFTER UPDATE OF
+        first_name, last_name, email, dni, membership_number ON members BEGIN
+        INSERT INTO members_fts(members_fts, rowid, first_name, last_name, email, dni, membership_number)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.dni, old.membership_number);
+        INSERT INTO members_fts(rowid, first_name, last_name, email, dni, membership_number)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.dni, new.membership_number);
+    END
+    """,
+]
+
+# Misma expresión en el índice y en las consultas para que el planner use el índice
+POSTGRES_SEARCH_EXPR = (
+    "immutable_unaccent(lower("
+    "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(dni, '') || ' ' || coalesce(membership_number, '')"
+    "))"
+)
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS
+    $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_members_search_trgm ON members USING gin ({POSTGRES_SEARCH_EXPR} gin_trgm_ops)",
+]
+
+def setup_member_search(engine: Engine):
+    """Crear (si falta) el índice de búsqueda de socios y elegir el backend"""
+    global search_backend
+    try:
+        if engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                exists = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'members_fts'"
+                ).first()
+                if not exists:
+                    for statement in SQLITE_SETUP:
+                        conn.exec_driver_sql(statement)
+                    # Indexar los socios existentes
+                    conn.exec_driver_sql("INSERT INTO members_fts(members_fts) VALUES ('rebuild')")
+                else:
+                    for statement in SQLITE_SETUP[1:]:
+                        conn.exec_driver_sql(statement)
+            search_backend = "fts5"
+        elif engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                for statement in POSTGRES_SETUP:
+                    conn.exec_driver_sql(statement)
+            search_backend = "trigram"
+    except Exception as e:
+        logger.warning(f"Member search index unavailable, falling back to ILIKE: {e}")
+        search_backend = "like"
+
+def rebuild_member_search(engine: Engine):
+    """Reconstruir el índice FTS5 desde la tabla members"""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO members_fts(members_fts) VALUES ('rebuild')")
+
+def fts_query(search: str) -> str:
+    """Convertir el texto ingresado en una consulta FTS5 segura (AND de prefijos)"""
+    terms = re.findall(r"\w+", search, flags=re.UNICODE)
+    return " ".join(f'"{term}"*' for term in terms)
+
+def apply_member_search(query, search: str):
+    """Filtrar y ordenar por relevancia un select de socios según el texto buscado"""
+    if search_backend == "fts5":
+        match = fts_query(search)
+        if not match:
+            return query
+        return query.join(members_fts, members_fts.c.rowid == models.Member.id).where(
+            text("members_fts MATCH :member_search").bindparams(member_search=match)
+        ).order_by(members_fts.c.rank)
+
+    if search_backend == "trigram":
+        search_expr = literal_column(POSTGRES_SEARCH_EXPR)
+        normalized = func.immutable_unaccent(func.lower(search.strip()))
+        return query.where(
+            search_expr.like(func.concat("%", normalized, "%"))
+        ).order_by(func.similarity(search_expr, normalized).desc())
+
+    search_filter = f"%{search}%"
+    return query.where(or_(*[
+        getattr(models.Member, name).ilike(search_filter) for name in MEMBER_SEARCH_COLUMNS
+    ]))
@@ -0,0 +1,68 @@
+"""
+Hash y verificación de contraseñas fuera del event loop.
+
+bcrypt es deliberadamente costoso (~100ms+), así que se ejecuta en un pool de
+threads acotado (bcrypt libera el GIL) con una cola máxima: si la cola se llena
+el request falla rápido con 503 en lugar de acaparar el servidor.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from typing import Optional, Tuple
+import asyncio
+import os
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt para contraseñas nuevas; los SHA-256 sin sal heredados se aceptan y se
+# re-hashean en el siguiente login exitoso
+pwd_context = CryptContext(
+    schemes=["bcrypt", "hex_sha256"],
+    deprecated=["hex_sha256"],
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+class BoundedExecutor:
+    """Pool de threads con límite de trabajos en curso + en espera"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._limit = workers + max_queue
+        self._pending = 0
+
+    async def run(self, fn, *args):
+        if self._pending >= self._limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_executor = BoundedExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verificar contraseña en el pool de hashing"""
+    valid, _ = await verify_and_update_password(plain_password, hashed_password)
+    return valid
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar contraseña y devolver un hash nuevo si el actual está obsoleto"""
+    try:
+        return await password_executor.run(pwd_context.verify_and_update, plain_password, hashed_password)
+    except ValueError:
+        # Hash con formato desconocido
+        return False, None
+
+async def get_password_hash(password: str) -> str:
+    """Hashear contraseña en el pool de hashing"""
+    return await password_executor.run(pwd_context.hash, password)
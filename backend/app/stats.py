@@ -0,0 +1,35 @@
+"""
+Consultas de estadísticas con agregación condicional.
+
+Varias métricas sobre la misma tabla y ventana de fechas salen de una sola
+pasada: cada métrica es un agregado con su propia condición (`CASE WHEN`) y el
+WHERE común solo acota la ventana, en lugar de una consulta por métrica.
+"""
+from decimal import Decimal
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def count_where(condition=None):
+    """COUNT(*) de las filas que cumplen la condición (todas si no se indica)"""
+    if condition is None:
+        return func.count()
+    return func.count(case((condition, 1)))
+
+def sum_where(column, condition=None):
+    """SUM de la columna en las filas que cumplen la condición (0 si no hay ninguna)"""
+    if condition is not None:
+        column = case((condition, column))
+    return func.coalesce(func.sum(column), 0)
+
+def stats_select(source, *criteria, **measures):
+    """SELECT de una sola pasada sobre `source` con una columna etiquetada por métrica"""
+    return select(*[measure.label(name) for name, measure in measures.items()]).select_from(source).where(*criteria)
+
+async def fetch_stats(db: AsyncSession, source, *criteria, **measures) -> dict:
+    """Ejecutar stats_select y devolver {métrica: valor}"""
+    row = (await db.execute(stats_select(source, *criteria, **measures))).one()
+    return dict(row._mapping)
+
+def as_decimal(value) -> Decimal:
+    # coalesce(..., 0) puede volver como int cuando no hubo filas
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
@@ -0,0 +1,182 @@
+"""
+Cupo semanal de visitas (`MembershipPlan.days_per_week`).
+
+La fuente de verdad es `weekly_visits`: una fila por socio y semana ISO con los
+días usados, que se incrementa con un UPDATE condicional (solo si hoy no vino y
+le queda cupo), así dos workers nunca conceden el mismo día de más.
+
+Cada worker guarda en memoria el último estado conocido de la semana actual
+(precargado al iniciar) y responde en O(1) sin tocar la base cuando el socio ya
+ingresó hoy o ya agotó el cupo; esos dos hechos no pueden revertirse dentro de
+la semana, así que un valor desactualizado nunca da una respuesta incorrecta.
+Solo el primer ingreso del día va a la base. Al cambiar la semana se descarta
+lo anterior.
+
+Si la asistencia no llega a guardarse, `release` devuelve el día consumido.
+"""
+from datetime import date, timedelta
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, NamedTuple, Optional
+from app.database import async_engine
+from app.date_ranges import day_start
+from app import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+counters = models.WeeklyVisitCounter.__table__
+attendance = models.Attendance.__table__
+
+class WeekUsage(NamedTuple):
+    days_used: int
+    last_visit_date: Optional[date]
+
+class QuotaDecision(NamedTuple):
+    allowed: bool
+    days_used: int
+    visited_today: bool
+    consumed: bool = False  # este llamado sumó el día de hoy al contador
+
+def week_start(day: date) -> date:
+    """Lunes de la semana ISO"""
+    return day - timedelta(days=day.weekday())
+
+def is_unlimited(days_per_week: Optional[int]) -> bool:
+    return not days_per_week or days_per_week >= 7
+
+class VisitQuota:
+    """Contadores semanales por socio: memoria por worker respaldada en weekly_visits"""
+
+    def __init__(self):
+        self._week: Optional[date] = None
+        self._usage: Dict[int, WeekUsage] = {}
+
+    def _current(self, today: date) -> Dict[int, WeekUsage]:
+        week = week_start(today)
+        if week != self._week:
+            # Cambio de semana: los contadores anteriores ya no aplican
+            self._week = week
+            self._usage = {}
+        return self._usage
+
+    def clear(self):
+        """Olvidar el estado en memoria (p. ej. después de vaciar la base)"""
+        self._week = None
+        self._usage = {}
+
+    async def warm_up(self, today: Optional[date] = None):
+        """Precargar los contadores de la semana actual"""
+        today = today or date.today()
+        usage = self._current(today)
+        async with async_engine.connect() as conn:
+            rows = await conn.execute(
+                select(counters.c.member_id, counters.c.days_used, counters.c.last_visit_date)
+                .where(counters.c.week_start == week_start(today))
+            )
+            for member_id, days_used, last_visit_date in rows:
+                usage[member_id] = WeekUsage(days_used, last_visit_date)
+        logger.info(f"Visit quota warm-up: {len(usage)} members with visits this week")
+
+    def peek(self, member_id: int, days_per_week: Optional[int], today: date) -> Optional[QuotaDecision]:
+        """Respuesta sin base de datos cuando el estado en memoria alcanza para decidir"""
+        usage = self._current(today).get(member_id)
+        if usage is None:
+            return None
+        if usage.last_visit_date == today:
+            return QuotaDecision(True, usage.days_used, True)
+        if usage.days_used >= days_per_week:
+            return QuotaDecision(False, usage.days_used, False)
+        return None
+
+    async def _load(self, conn, member_id: int, today: date) -> WeekUsage:
+        row = (await conn.execute(
+            select(counters.c.days_used, counters.c.last_visit_date).where(
+                counters.c.member_id == member_id, counters.c.week_start == week_start(today)
+            )
+        )).first()
+        return WeekUsage(row.days_used, row.last_visit_date) if row else WeekUsage(0, None)
+
+    async def _seed_days(self, conn, member_id: int, today: date) -> int:
+        """Días ya asistidos esta semana según attendance (contador creado a mitad de semana)"""
+        visits = (await conn.execute(
+            select(attendance.c.checked_in_at).where(
+                attendance.c.member_id == member_id,
+                attendance.c.checked_in_at >= day_start(week_start(today)),
+                attendance.c.checked_in_at < day_start(today)
+            )
+        )).scalars()
+        return len({visit.date() for visit in visits})
+
+    async def status(self, member_id: int, days_per_week: Optional[int], today: Optional[date] = None) -> QuotaDecision:
+        """¿Puede ingresar hoy? (sin consumir cupo)"""
+        today = today or date.today()
+        if is_unlimited(days_per_week):
+            return QuotaDecision(True, 0, False)
+        decision = self.peek(member_id, days_per_week, today)
+        if decision is not None:
+            return decision
+        async with async_engine.connect() as conn:
+            usage = await self._load(conn, member_id, today)
+        self._current(today)[member_id] = usage
+        visited_today = usage.last_visit_date == today
+        return QuotaDecision(visited_today or usage.days_used < days_per_week, usage.days_used, visited_today)
+
+    async def consume(self, member_id: int, days_per_week: Optional[int], today: Optional[date] = None) -> QuotaDecision:
+        """Registrar el ingreso de hoy si queda cupo (idempotente dentro del día)"""
+        today = today or date.today()
+        if is_unlimited(days_per_week):
+            return QuotaDecision(True, 0, False)
+        decision = self.peek(member_id, days_per_week, today)
+        if decision is not None:
+            return decision
+
+        week = week_start(today)
+        try:
+            async with async_engine.begin() as conn:
+                result = await conn.execute(
+                    update(counters).where(
+                        counters.c.member_id == member_id,
+                        counters.c.week_start == week,
+                        counters.c.last_visit_date < today,
+                        counters.c.days_used < days_per_week
+                    ).values(days_used=counters.c.days_used + 1, last_visit_date=today)
+                )
+                granted = bool(result.rowcount)
+                usage = await self._load(conn, member_id, today)
+                if not granted and usage.last_visit_date is None:
+                    # Primer ingreso de la semana: contar lo ya asistido antes de crear el contador
+                    days_used = await self._seed_days(conn, member_id, today)
+                    usage = WeekUsage(days_used, None)
+                    if days_used < days_per_week:
+                        await conn.execute(insert(counters).values(
+                            member_id=member_id, week_start=week,
+                            days_used=days_used + 1, last_visit_date=today
+                        ))
+                        granted = True
+                        usage = WeekUsage(days_used + 1, today)
+        except IntegrityError:
+            # Otro worker creó la fila en paralelo: volver a intentar con el UPDATE
+            return await self.consume(member_id, days_per_week, today)
+
+        self._current(today)[member_id] = usage
+        visited_today = usage.last_visit_date == today
+        return QuotaDecision(granted or visited_today, usage.days_used, visited_today, granted)
+
+    async def release(self, member_id: int, today: date):
+        """Devolver el día consumido por un ingreso que no llegó a registrarse"""
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                update(counters).where(
+                    counters.c.member_id == member_id,
+                    counters.c.week_start == week_start(today),
+                    counters.c.last_visit_date == today
+                ).values(
+                    days_used=counters.c.days_used - 1,
+                    # Cualquier fecha anterior a hoy permite volver a consumir el día
+                    last_visit_date=today - timedelta(days=1)
+                )
+            )
+        self._current(today).pop(member_id, None)
+
+visit_quota = VisitQuota()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de búsqueda de socios: ILIKE '%term%' vs índice FTS5.
+
+Crea una base SQLite temporal con N socios (100.000 por defecto) y mide la
+latencia de ambas estrategias para varios términos de búsqueda.
+
+Uso: python benchmark_member_search.py [cantidad_de_socios]
+"""
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import select, text
+from app.database import create_sqlite_engine
+from app.models import Base, Member, MembershipPlan
+from app import search
+
+FIRST_NAMES = ["José", "María", "Juan", "Ana", "Lucía", "Martín", "Sofía", "Tomás", "Valentina", "Agustín",
+               "Camila", "Matías", "Florencia", "Nicolás", "Julieta", "Ramón", "Inés", "Germán", "Belén", "Andrés"]
+LAST_NAMES = ["Pérez", "González", "Rodríguez", "Fernández", "López", "Martínez", "García", "Sánchez",
+              "Romero", "Díaz", "Álvarez", "Muñoz", "Gómez", "Ruiz", "Giménez", "Acuña", "Peña", "Ibáñez"]
+SEARCH_TERMS = ["perez", "Gómez", "mar", "jose lopez", "3456", "GYM2024001", "ibanez", "xyz"]
+RUNS = 20
+
+def populate(engine, total: int):
+    """Insertar socios de prueba en lotes"""
+    with engine.begin() as conn:
+        conn.execute(MembershipPlan.__table__.insert(), [{"name": "Plan", "price": 1000, "days_per_week": 3}])
+        batch = []
+        for i in range(1, total + 1):
+            first = random.choice(FIRST_NAMES)
+            last = random.choice(LAST_NAMES)
+            batch.append({
+                "membership_number": f"GYM2024{i:06d}",
+                "first_name": first,
+                "last_name": last,
+                "dni": str(20000000 + i),
+                "email": f"{first.lower()}.{last.lower()}{i}@mail.com",
+                "membership_plan_id": 1,
+                "membership_start_date": date(2024, 1, 1),
+                "membership_end_date": date(2024, 2, 1),
+                "is_active": True
+            })
+            if len(batch) == 10000:
+                conn.execute(Member.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Member.__table__.insert(), batch)
+
+def measure(engine, backend: str, term: str) -> float:
+    """Latencia media (ms) de la primera página de resultados"""
+    search.search_backend = backend
+    query = search.apply_member_search(select(Member.id), term).limit(100)
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            conn.execute(query).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    tmp_dir = tempfile.mkdtemp()
+    engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+
+    print(f"📦 Creando {total} socios de prueba...")
+    Base.metadata.create_all(bind=engine)
+    search.setup_member_search(engine)
+    start = time.perf_counter()
+    populate(engine, total)
+    print(f"   ✅ Insertados en {time.perf_counter() - start:.1f}s (índice FTS5 mantenido por triggers)")
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+
+    print()
+    print(f"{'Término':<14}{'ILIKE (ms)':>12}{'FTS5 (ms)':>12}{'Mejora':>10}")
+    print("-" * 48)
+    for term in SEARCH_TERMS:
+        like_ms = measure(engine, "like", term)
+        fts_ms = measure(engine, "fts5", term)
+        print(f"{term:<14}{like_ms:>12.2f}{fts_ms:>12.2f}{like_ms / max(fts_ms, 0.001):>9.1f}x")
+
+    engine.dispose()
+
+if __name__ == "__main__":
+    print("🏋️ Benchmark de Búsqueda de Socios - Gym Management System")
+    print("=" * 60)
+    print()
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark del alta masiva de pagos: POST /api/payments/bulk vs pagos uno por uno.
+
+Crea una base SQLite temporal con socios de prueba y registra N pagos (10.000
+por defecto) con `create_payments_bulk` en una sola llamada; como referencia
+mide una muestra con el flujo de `create_payment` (buscar socio, insertar,
+actualizar agregados y commit por pago) y lo extrapola a N.
+
+Uso: python benchmark_payment_bulk.py [cantidad_de_pagos]
+"""
+import sys
+import os
+import asyncio
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import create_async_sqlite_engine, create_sqlite_engine
+from app import schemas
+from app.models import Base, Member, MembershipPlan, Payment
+from app.member_stats import apply_payment_change
+from app.payment_batch import create_payments_bulk
+from app.revenue_daily import apply_revenue_change
+
+MEMBERS = 2000
+SEQUENTIAL_SAMPLE = 300
+
+def populate(engine):
+    """Socios de prueba (el 5% inactivos, para ejercitar los errores por ítem)"""
+    with engine.begin() as conn:
+        conn.execute(MembershipPlan.__table__.insert(), [{"name": "Plan", "price": 1000, "days_per_week": 3}])
+        conn.execute(Member.__table__.insert(), [{
+            "membership_number": f"GYM2024{i:06d}", "first_name": "Socio", "last_name": str(i),
+            "dni": str(30000000 + i), "email": f"socio{i}@mail.com", "membership_plan_id": 1,
+            "membership_start_date": date(2024, 1, 1), "membership_end_date": date(2024, 2, 1),
+            "is_active": i % 20 != 0
+        } for i in range(1, MEMBERS + 1)])
+
+def payment_items(total: int):
+    return [{
+        "member_id": random.randint(1, MEMBERS + 10),  # Algunos socios inexistentes
+        "amount": str(random.choice([8000, 12000, 15000])),
+        "payment_method": random.choice(["cash", "card", "transfer"]),
+        "payment_concept": "membership"
+    } for _ in range(total)]
+
+async def sequential(session_factory, items) -> int:
+    """Mismo flujo que create_payment, un pago por transacción"""
+    created = 0
+    for item in items:
+        async with session_factory() as db:
+            data = schemas.PaymentCreate.model_validate(item)
+            member = await db.get(Member, data.member_id)
+            if member is None or not member.is_active:
+                continue
+            payment = Payment(**data.dict())
+            db.add(payment)
+            await apply_payment_change(db, None, payment)
+            await apply_revenue_change(db, None, payment)
+            await db.commit()
+            created += 1
+    return created
+
+async def run(total: int, db_path: str):
+    engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    def session_factory():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    items = payment_items(total)
+    start = time.perf_counter()
+    async with session_factory() as db:
+        result = await create_payments_bulk(db, items)
+    bulk_seconds = time.perf_counter() - start
+    print(f"   Bulk: {result.created} creados, {result.failed} con error en {bulk_seconds * 1000:.0f} ms "
+          f"({total / bulk_seconds:,.0f} pagos/s)")
+
+    sample = items[:SEQUENTIAL_SAMPLE]
+    start = time.perf_counter()
+    created = await sequential(session_factory, sample)
+    per_payment = (time.perf_counter() - start) / len(sample)
+    print(f"   Uno por uno: {per_payment * 1000:.2f} ms por pago ({created} de {len(sample)} creados) "
+          f"→ ~{per_payment * total:.1f} s para {total}")
+    print(f"   Mejora estimada: {per_payment * total / bulk_seconds:.0f}x")
+
+    async with session_factory() as db:
+        count = await db.scalar(select(func.count(Payment.id)))
+    print(f"   Pagos en la base: {count}")
+    await engine.dispose()
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "benchmark.db")
+    engine = create_sqlite_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    populate(engine)
+    engine.dispose()
+
+    print(f"📦 Registrando {total} pagos sobre {MEMBERS} socios...")
+    asyncio.run(run(total, db_path))
+
+if __name__ == "__main__":
+    print("🏋️ Benchmark de Alta Masiva de Pagos - Gym Management System")
+    print("=" * 60)
+    print()
+    main()
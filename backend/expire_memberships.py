@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Script para desactivar a los socios con la membresía vencida.
+
+Pensado para correr por cron cuando el job interno está deshabilitado
+(MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS=0).
+"""
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import async_engine
+from app.expiration import expire_memberships
+
+async def main():
+    try:
+        result = await expire_memberships()
+    finally:
+        await async_engine.dispose()
+    print(f"✅ {result['expired_members']} socios desactivados "
+          f"(vencidos antes del {result['cutoff_date']}) en {result['duration_ms']}ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
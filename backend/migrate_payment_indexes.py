@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migración: índices de pagos para filtros por rango de fechas.
+
+Crea (si faltan) los índices declarados en el modelo Payment sobre una base ya
+existente y actualiza las estadísticas del planificador:
+  • ix_payments_payment_date            (payment_date)
+  • ix_payments_verified_payment_date   (is_verified, payment_date)
+  • ix_payments_member_payment_date     (member_id, payment_date)
+
+Es idempotente y funciona en SQLite y Postgres (usa DATABASE_URL). Al iniciar,
+la aplicación también crea los índices faltantes; este script permite hacerlo
+antes del deploy en tablas grandes.
+
+Uso: python migrate_payment_indexes.py
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app.database import engine
+from app.models import Base, Payment
+
+def migrate_payment_indexes():
+    """Crear los índices faltantes de payments"""
+    print("🔄 Creando índices de la tabla payments...")
+    Base.metadata.create_all(bind=engine, tables=[Payment.__table__])
+
+    existing = {index["name"] for index in inspect(engine).get_indexes("payments")}
+    created = []
+    for index in sorted(Payment.__table__.indexes, key=lambda index: index.name):
+        if index.name in existing:
+            print(f"   • {index.name} ya existe")
+            continue
+        index.create(bind=engine)
+        created.append(index.name)
+        print(f"   ✅ {index.name} ({', '.join(column.name for column in index.columns)})")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE payments"))
+
+    print(f"✅ Migración completada: {len(created)} índices creados")
+    return True
+
+if __name__ == "__main__":
+    print("🏋️ Migración de Índices de Pagos - Gym Management System")
+    print("=" * 60)
+    try:
+        migrate_payment_indexes()
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
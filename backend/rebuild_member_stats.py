@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir el read model member_stats desde la tabla payments.
+
+Los endpoints de pagos lo mantienen al día; usar este script después de cargar
+pagos por fuera de la API o si se sospecha que los agregados quedaron desfasados.
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select
+from app.database import engine
+from app.models import Base, MemberStats
+from app.member_stats import rebuild_member_stats
+
+def main():
+    print("🔄 Reconstruyendo estadísticas de socios...")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        rebuild_member_stats(conn)
+        total = conn.scalar(select(func.count()).select_from(MemberStats.__table__))
+    print(f"   ✅ {total} socios con estadísticas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir (o verificar) el rollup revenue_daily desde payments.
+
+Los endpoints de pagos lo mantienen al día; usar este script después de cargar
+pagos por fuera de la API o si el chequeo encuentra diferencias.
+
+Uso:
+  python rebuild_revenue_daily.py          # reconstruir
+  python rebuild_revenue_daily.py --check  # solo comparar (sale con 1 si hay diferencias)
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select
+from app.database import engine
+from app.models import Base, RevenueDaily
+from app.revenue_daily import check_revenue_daily, rebuild_revenue_daily
+
+def check() -> bool:
+    print("🔍 Comparando revenue_daily con payments...")
+    with engine.connect() as conn:
+        mismatches = check_revenue_daily(conn)
+    if not mismatches:
+        print("   ✅ El rollup coincide con los pagos")
+        return True
+    print(f"   ❌ {len(mismatches)} filas con diferencias:")
+    for row in mismatches[:50]:
+        print(f"      {row['day']} {row['payment_method']}/{row['payment_concept']} "
+              f"verificado={row['is_verified']}: guardado {row['stored_amount']} ({row['stored_count']}) "
+              f"vs real {row['expected_amount']} ({row['expected_count']})")
+    print("   Ejecutar sin --check para reconstruirlo")
+    return False
+
+def rebuild():
+    print("🔄 Reconstruyendo revenue_daily...")
+    with engine.begin() as conn:
+        rebuild_revenue_daily(conn)
+        total = conn.scalar(select(func.count()).select_from(RevenueDaily.__table__))
+    print(f"   ✅ {total} filas en el rollup")
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    if "--check" in sys.argv[1:]:
+        sys.exit(0 if check() else 1)
+    rebuild()
+
+if __name__ == "__main__":
+    main()
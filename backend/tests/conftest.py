@@ -0,0 +1,51 @@
+"""
+Fixtures comunes: la app sobre una base SQLite temporal, con presupuestos de
+consultas estrictos, y un administrador autenticado.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="gym-tests-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ.pop("MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS", None)
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.auth import token_cache, user_cache
+import pytest
+
+ADMIN = {"username": "admin", "email": "admin@gym.test", "full_name": "Admin", "password": "secret"}
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/auth/register", json=ADMIN)
+    assert response.status_code == 201, response.text
+    response = client.post("/api/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def plan(client, auth_headers):
+    response = client.post(
+        "/api/settings/membership-plans",
+        json={"name": "Libre", "price": "100", "days_per_week": 7}, headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.fixture
+def cold_auth_cache():
+    """Vaciar la caché de auth: get_current_user vuelve a consultar el usuario"""
+    token_cache.clear()
+    user_cache.clear()
@@ -0,0 +1,80 @@
+from datetime import date, datetime
+from app.attendance import AttendanceWriter, attendance_writer
+import asyncio
+import pytest
+
+@pytest.fixture(scope="module")
+def member(client, auth_headers, plan):
+    response = client.post("/api/members/", json={
+        "first_name": "Clara", "last_name": "Check-in", "dni": "checkin-1", "email": "clara@gym.test",
+        "membership_plan_id": plan["id"], "membership_start_date": date.today().isoformat()
+    }, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_check_in_uses_the_same_day_as_daily_windows(client, auth_headers, member):
+    before = client.get("/api/dashboard/stats", headers=auth_headers).json()["attendance_today"]
+
+    response = client.post("/api/attendance/check-in", json={"identifier": member["dni"]}, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    assert datetime.fromisoformat(response.json()["checked_in_at"]).date() == date.today()
+
+    today = date.today().isoformat()
+    listed = client.get(
+        "/api/attendance/", params={"member_id": member["id"], "start_date": today, "end_date": today},
+        headers=auth_headers
+    ).json()
+    assert [visit["member_id"] for visit in listed] == [member["id"]]
+    assert client.get("/api/dashboard/stats", headers=auth_headers).json()["attendance_today"] == before + 1
+
+@pytest.fixture(scope="module")
+def limited_member(client, auth_headers):
+    plan = client.post(
+        "/api/settings/membership-plans",
+        json={"name": "Una vez por semana", "price": "50", "days_per_week": 1}, headers=auth_headers
+    ).json()
+    response = client.post("/api/members/", json={
+        "first_name": "Luis", "last_name": "Cupo", "dni": "quota-1", "email": "luis@gym.test",
+        "membership_plan_id": plan["id"], "membership_start_date": date.today().isoformat()
+    }, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_failed_check_in_gives_the_day_back(client, auth_headers, limited_member, monkeypatch):
+    async def fail(row):
+        raise RuntimeError("attendance insert failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(attendance_writer, "record", fail)
+        with pytest.raises(RuntimeError):
+            client.post("/api/attendance/check-in", json={"identifier": limited_member["dni"]}, headers=auth_headers)
+
+    quota = client.get(f"/api/attendance/quota/{limited_member['id']}", headers=auth_headers).json()
+    assert (quota["days_used"], quota["visited_today"], quota["can_enter"]) == (0, False, True)
+
+    response = client.post("/api/attendance/check-in", json={"identifier": limited_member["dni"]}, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    assert response.json()["weekly_visits"] == 1
+
+def test_failed_row_does_not_fail_the_rest_of_the_batch(client, auth_headers, member):
+    checked_in_at = datetime.now()
+
+    async def record_batch():
+        writer = AttendanceWriter()
+        writer.start()
+        try:
+            # Encolados antes de que el writer corra: salen en el mismo lote
+            return await asyncio.gather(
+                writer.record({"member_id": member["id"], "checked_in_at": checked_in_at, "method": "dni"}),
+                writer.record({"member_id": None, "checked_in_at": checked_in_at, "method": "dni"}),
+                return_exceptions=True
+            )
+        finally:
+            await writer.stop()
+
+    good, bad = client.portal.call(record_batch)
+    assert good is None
+    assert isinstance(bad, Exception)
+
+    visits = client.get("/api/attendance/", params={"member_id": member["id"]}, headers=auth_headers).json()
+    assert checked_in_at in [datetime.fromisoformat(visit["checked_in_at"]) for visit in visits]
@@ -0,0 +1,48 @@
+from app.routers.auth import user_cache
+import pytest
+
+PASSWORD = "secret-1"
+
+@pytest.fixture
+def user(client, auth_headers, request):
+    name = request.node.name.replace("[", "-").replace("]", "")
+    response = client.post("/api/auth/register", json={
+        "username": name, "email": f"{name}@gym.test", "full_name": "Staff", "password": PASSWORD
+    })
+    assert response.status_code == 201, response.text
+    login = client.post("/api/auth/login", json={"email": f"{name}@gym.test", "password": PASSWORD})
+    assert login.status_code == 200, login.text
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    # Primer request: el usuario queda en la caché de auth
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert user_cache.get(name) is not None
+    return {**response.json(), "headers": headers}
+
+def test_update_user_drops_cached_user(client, auth_headers, user):
+    response = client.put(f"/api/auth/users/{user['id']}", json={"full_name": "Renamed"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert user_cache.get(user["username"]) is None
+    assert client.get("/api/auth/me", headers=user["headers"]).json()["full_name"] == "Renamed"
+
+def test_delete_user_rejects_the_next_request(client, auth_headers, user):
+    response = client.delete(f"/api/auth/users/{user['id']}", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert user_cache.get(user["username"]) is None
+    assert client.get("/api/auth/me", headers=user["headers"]).status_code == 400
+    assert client.get("/api/members/", headers=user["headers"]).status_code == 400
+
+def test_deactivated_user_is_rejected_on_the_next_request(client, auth_headers, user):
+    response = client.put(f"/api/auth/users/{user['id']}", json={"is_active": False}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/api/members/", headers=user["headers"]).status_code == 400
+
+def test_password_change_drops_cached_user(client, user):
+    change = {"current_password": PASSWORD, "new_password": "secret-2"}
+    response = client.post("/api/auth/change-password", params=change, headers=user["headers"])
+    assert response.status_code == 200, response.text
+    assert user_cache.get(user["username"]) is None
+
+    # El hash cacheado ya no sirve: la contraseña anterior se rechaza
+    response = client.post("/api/auth/change-password", params=change, headers=user["headers"])
+    assert response.status_code == 400
+    assert client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD}).status_code == 401
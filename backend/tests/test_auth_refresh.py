@@ -0,0 +1,37 @@
+from conftest import ADMIN
+
+def login(client) -> str:
+    response = client.post("/api/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]})
+    assert response.status_code == 200, response.text
+    return response.json()["refresh_token"]
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+def test_refresh_rotates_the_token(client, auth_headers):
+    first = login(client)
+    response = refresh(client, first)
+    assert response.status_code == 200, response.text
+    rotated = response.json()["refresh_token"]
+    assert rotated != first
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).status_code == 200
+
+    assert refresh(client, first).status_code == 401
+
+def test_reusing_a_rotated_token_revokes_the_whole_family(client, auth_headers):
+    first = login(client)
+    other_login = login(client)
+    rotated = refresh(client, first).json()["refresh_token"]
+
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, rotated).status_code == 401
+    # Otros logins del mismo usuario no se ven afectados
+    assert refresh(client, other_login).status_code == 200
+
+def test_logout_revokes_the_refresh_token(client, auth_headers):
+    token = login(client)
+    rotated = refresh(client, token).json()["refresh_token"]
+
+    response = client.post("/api/auth/logout", json={"refresh_token": rotated})
+    assert response.status_code == 200, response.text
+    assert refresh(client, rotated).status_code == 401
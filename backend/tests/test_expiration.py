@@ -0,0 +1,5 @@
+from app import expiration
+
+def test_expiration_job_is_opt_in(client):
+    assert expiration.MEMBERSHIP_EXPIRATION_INTERVAL_SECONDS == 0
+    assert client.app.state.expiration_task is None
@@ -0,0 +1,14 @@
+import pytest
+
+@pytest.mark.parametrize("path, fields", [
+    ("/api/auth/users", "id,username"),
+    ("/api/settings/membership-plans", "id,name"),
+    ("/api/settings/membership-plans/all", "id,name"),
+])
+def test_projection_returns_only_requested_fields(client, auth_headers, plan, path, fields):
+    response = client.get(path, params={"fields": fields}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert int(response.headers["content-length"]) == len(response.content)
+    items = response.json()
+    assert items
+    assert all(set(item) == set(fields.split(",")) for item in items)
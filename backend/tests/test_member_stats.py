@@ -0,0 +1,38 @@
+from decimal import Decimal
+from sqlalchemy import insert, select
+from sqlalchemy.sql import Update
+from app import models
+from app.database import AsyncSessionLocal
+from app.member_stats import apply_payment_change, stats
+
+def test_first_payment_survives_a_concurrent_stats_row(client, auth_headers, plan):
+    member = client.post("/api/members/", json={
+        "first_name": "Rita", "last_name": "Carrera", "dni": "race-1", "email": "rita@gym.test",
+        "membership_plan_id": plan["id"], "membership_start_date": "2026-10-01"
+    }, headers=auth_headers).json()
+
+    async def pay():
+        async with AsyncSessionLocal() as db:
+            execute = db.execute
+
+            async def racing_execute(statement, *args, **kwargs):
+                result = await execute(statement, *args, **kwargs)
+                if isinstance(statement, Update) and statement.table is stats and not result.rowcount:
+                    # Otra transacción crea la fila después del UPDATE y antes del INSERT
+                    await execute(insert(stats).values(
+                        member_id=member["id"], total_verified_amount=0, payment_count=0, outstanding_amount=0
+                    ))
+                return result
+
+            db.execute = racing_execute
+            payment = models.Payment(
+                member_id=member["id"], amount=Decimal("25.00"), payment_method="cash", payment_concept="membership"
+            )
+            db.add(payment)
+            await apply_payment_change(db, None, payment)
+            await db.commit()
+            return (await db.execute(select(stats.c.payment_count, stats.c.outstanding_amount).where(
+                stats.c.member_id == member["id"]
+            ))).one()
+
+    assert tuple(client.portal.call(pay)) == (1, Decimal("25.00"))
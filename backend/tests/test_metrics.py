@@ -0,0 +1,22 @@
+import re
+
+def requests_total(client, route: str, status: int) -> float:
+    body = client.get("/metrics").text
+    match = re.search(
+        rf'^http_requests_total\{{method="GET",route="{re.escape(route)}",status="{status}"\}} (\S+)$', body, re.M
+    )
+    return float(match.group(1)) if match else 0
+
+def test_error_responses_are_counted_with_their_status(client, auth_headers):
+    unauthorized = requests_total(client, "/api/members/", 401)
+    not_found = requests_total(client, "/api/payments/{payment_id}", 404)
+    invalid = requests_total(client, "/api/payments/{payment_id}", 422)
+
+    assert client.get("/api/members/", headers={"Authorization": "Bearer invalid"}).status_code == 401
+    assert client.get("/api/payments/999999", headers=auth_headers).status_code == 404
+    assert client.get("/api/payments/not-a-number", headers=auth_headers).status_code == 422
+
+    assert requests_total(client, "/api/members/", 401) == unauthorized + 1
+    assert requests_total(client, "/api/payments/{payment_id}", 404) == not_found + 1
+    assert requests_total(client, "/api/payments/{payment_id}", 422) == invalid + 1
+    assert requests_total(client, "/api/members/", 500) == 0
@@ -0,0 +1,32 @@
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import QueryBudgetExceeded, get_db, query_budget
+from app import main
+import logging
+import pytest
+
+BUDGET = 2
+
+@main.app.get("/_tests/query-budget", dependencies=[Depends(query_budget(BUDGET))])
+async def run_queries(queries: int, db: AsyncSession = Depends(get_db)):
+    for _ in range(queries):
+        await db.execute(text("SELECT 1"))
+    return {"queries": queries}
+
+def test_within_budget(client):
+    response = client.get("/_tests/query-budget", params={"queries": BUDGET})
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == str(BUDGET)
+
+def test_over_budget_fails_in_strict_mode(client):
+    with pytest.raises(QueryBudgetExceeded, match=f"ejecutó {BUDGET + 1} consultas"):
+        client.get("/_tests/query-budget", params={"queries": BUDGET + 1})
+
+def test_over_budget_only_logs_outside_strict_mode(client, monkeypatch, caplog):
+    monkeypatch.setattr(main, "QUERY_BUDGET_STRICT", False)
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        response = client.get("/_tests/query-budget", params={"queries": BUDGET + 1})
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == str(BUDGET + 1)
+    assert f"presupuesto: {BUDGET}" in caplog.text
@@ -0,0 +1,63 @@
+"""
+Sentencias SQL exactas por request en listados y detalles (header X-DB-Query-Count).
+
+Los conteos no dependen de la cantidad de filas: un N+1 los haría crecer. Con la
+caché de auth vacía get_current_user suma una consulta, que el presupuesto de
+cada ruta ya contempla.
+"""
+from datetime import date
+import pytest
+
+ENDPOINTS = [
+    ("/api/members/", 1),
+    ("/api/members/?include=plan,trainer", 1),
+    ("/api/members/?fields=id,first_name", 1),
+    ("/api/members/expiring", 1),
+    ("/api/members/{member_id}", 3),
+    ("/api/members/{member_id}/payments", 2),
+    ("/api/payments/", 1),
+    ("/api/payments/?fields=id,amount,member.last_name", 1),
+    ("/api/payments/{payment_id}", 1),
+    ("/api/payments/stats/today", 1),
+    ("/api/payments/stats/month", 1),
+    ("/api/attendance/", 1),
+    ("/api/attendance/quota/{member_id}", 1),
+    ("/api/dashboard/stats", 3),
+    ("/api/dashboard/recent-activity", 3),
+    ("/api/dashboard/revenue-trends", 1),
+    ("/api/dashboard/revenue-trends?breakdown=plan", 1),
+    ("/api/settings/membership-plans", 1),
+    ("/api/auth/users", 1),
+]
+
+@pytest.fixture(scope="module")
+def ids(client, auth_headers, plan):
+    """Varios socios con pagos y asistencias para que un N+1 se note en el conteo"""
+    for number in range(3):
+        member = client.post("/api/members/", json={
+            "first_name": f"Socio{number}", "last_name": "Conteo", "dni": f"count-{number}",
+            "email": f"count{number}@gym.test", "membership_plan_id": plan["id"],
+            "membership_start_date": date.today().isoformat()
+        }, headers=auth_headers).json()
+        for amount in ("10.00", "20.00"):
+            payment = client.post("/api/payments/", json={
+                "member_id": member["id"], "amount": amount,
+                "payment_method": "cash", "payment_concept": "membership"
+            }, headers=auth_headers).json()
+        response = client.post("/api/attendance/check-in", json={"identifier": member["dni"]}, headers=auth_headers)
+        assert response.status_code == 201, response.text
+    return {"member_id": member["id"], "payment_id": payment["id"]}
+
+def get(client, auth_headers, path, ids):
+    response = client.get(path.format(**ids), headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return int(response.headers["x-db-query-count"])
+
+@pytest.mark.parametrize("path, queries", ENDPOINTS)
+def test_query_count(client, auth_headers, ids, path, queries):
+    client.get("/api/auth/me", headers=auth_headers)  # usuario en la caché de auth
+    assert get(client, auth_headers, path, ids) == queries
+
+@pytest.mark.parametrize("path, queries", ENDPOINTS)
+def test_query_count_with_cold_auth_cache(client, auth_headers, ids, path, queries, cold_auth_cache):
+    assert get(client, auth_headers, path, ids) == queries + 1
@@ -0,0 +1,57 @@
+"""
+Planes de SQLite (EXPLAIN QUERY PLAN) de las consultas que dependen de un índice.
+
+Corren sobre una base aparte con datos de muestra y ANALYZE, para que el
+planificador decida con estadísticas. Si un cambio en la consulta o en los índices
+vuelve a un recorrido completo de la tabla, estos tests fallan. El chequeo
+equivalente en PostgreSQL se hace a mano con `explain_payment_queries.py <url>`.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from app.database import create_sqlite_engine
+from app.expiration import expire_statement
+from app.models import Base, Member, MembershipPlan, Payment
+from app.query_plans import explain, payment_index_queries
+import random
+import pytest
+
+SAMPLE_MEMBERS = 200
+SAMPLE_PAYMENTS = 5000
+
+@pytest.fixture(scope="module")
+def sample_db(tmp_path_factory):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(MembershipPlan.__table__.insert(), [{"name": "Plan", "price": 1000, "days_per_week": 3}])
+        conn.execute(Member.__table__.insert(), [{
+            "membership_number": f"GYM2024{i:06d}", "first_name": "Socio", "last_name": str(i),
+            "dni": str(30000000 + i), "email": f"socio{i}@mail.com", "membership_plan_id": 1,
+            "membership_start_date": date(2024, 1, 1), "membership_end_date": date(2024, 2, 1) + timedelta(days=i * 5),
+            "is_active": rng.random() < 0.3
+        } for i in range(1, SAMPLE_MEMBERS + 1)])
+        conn.execute(Payment.__table__.insert(), [{
+            "member_id": rng.randint(1, SAMPLE_MEMBERS), "amount": 1000,
+            "payment_date": now - timedelta(days=rng.randint(0, 730), minutes=rng.randint(0, 1440)),
+            "payment_method": "cash", "payment_concept": "membership",
+            "is_verified": rng.random() < 0.8
+        } for _ in range(SAMPLE_PAYMENTS)])
+        conn.execute(text("ANALYZE"))
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+@pytest.mark.parametrize(
+    "query, index_name",
+    [(query, index_name) for _, query, index_name in payment_index_queries()],
+    ids=[description for description, _, _ in payment_index_queries()]
+)
+def test_payment_queries_use_index(sample_db, query, index_name):
+    plan = explain(sample_db, query)
+    assert f"USING INDEX {index_name}" in plan or f"USING COVERING INDEX {index_name}" in plan, plan
+
+def test_expiration_uses_active_end_date_index(sample_db):
+    plan = explain(sample_db, expire_statement(date.today()))
+    assert "ix_members_active_end_date (is_active=? AND membership_end_date<?)" in plan, plan
@@ -0,0 +1,56 @@
+"""Los read models (revenue_daily, member_stats) coinciden con lo calculado desde payments"""
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from app.database import engine
+from app.member_stats import STATS_COLUMNS, stats, stats_select
+from app.revenue_daily import check_revenue_daily
+
+def as_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def normalized(rows):
+    return {
+        member_id: (Decimal(verified), count, Decimal(outstanding), as_datetime(last_payment), as_datetime(last_verified))
+        for member_id, verified, count, outstanding, last_payment, last_verified in rows
+    }
+
+def test_payment_lifecycle_keeps_read_models_consistent(client, auth_headers, plan):
+    members = [
+        client.post("/api/members/", json={
+            "first_name": "Lectura", "last_name": str(number), "dni": f"read-model-{number}",
+            "email": f"read-model-{number}@gym.test", "membership_plan_id": plan["id"],
+            "membership_start_date": "2026-10-01"
+        }, headers=auth_headers).json()
+        for number in range(2)
+    ]
+
+    def create(member, amount, method="cash"):
+        response = client.post("/api/payments/", json={
+            "member_id": member["id"], "amount": amount, "payment_method": method, "payment_concept": "membership"
+        }, headers=auth_headers)
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    def ok(response):
+        assert response.status_code in (200, 204), response.text
+
+    first = create(members[0], "100.00")
+    second = create(members[0], "40.00", "card")
+    third = create(members[1], "25.00")
+
+    ok(client.put(f"/api/payments/{first}/verify", headers=auth_headers))
+    ok(client.put(f"/api/payments/{first}", json={"amount": "120.00", "payment_method": "transfer"}, headers=auth_headers))
+    ok(client.put(f"/api/payments/{second}/verify", headers=auth_headers))
+    ok(client.put(f"/api/payments/{second}/unverify", headers=auth_headers))
+    ok(client.delete(f"/api/payments/{third}", headers=auth_headers))
+    create(members[1], "60.00")
+    ok(client.post("/api/payments/bulk-verify", json={"member_id": members[1]["id"]}, headers=auth_headers))
+    ok(client.post("/api/payments/bulk-verify", json={"ids": [first, second]}, headers=auth_headers))
+
+    with engine.connect() as conn:
+        assert check_revenue_daily(conn) == []
+        stored = normalized(conn.execute(select(*[stats.c[name] for name in STATS_COLUMNS])))
+        expected = normalized(conn.execute(stats_select()))
+    # Un socio que se quedó sin pagos puede conservar su fila en cero
+    assert {member_id: row for member_id, row in stored.items() if row[1]} == expected
@@ -0,0 +1,116 @@
+"""Los endpoints que escriben fuera del flush del ORM marcan al cliente para leer del primario"""
+from datetime import timedelta
+from starlette.requests import Request
+from app import database
+from app.routers import attendance
+from app.routers.auth import create_access_token
+import pytest
+
+ADMIN_USERNAME = "admin"
+
+@pytest.fixture
+def recent_writes(monkeypatch):
+    keys = []
+    monkeypatch.setattr(database, "mark_recent_write", keys.append)
+    monkeypatch.setattr(attendance, "mark_recent_write", keys.append)
+    return keys
+
+def test_member_import_marks_recent_write(client, auth_headers, plan, recent_writes):
+    content = (
+        "first_name,last_name,dni,email,membership_plan_id,membership_start_date\n"
+        f"Ana,Import,import-1,ana.import@gym.test,{plan['id']},2026-10-01\n"
+    )
+    response = client.post(
+        "/api/members/import", files={"file": ("members.csv", content, "text/csv")}, headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["imported"] == 1
+    assert ADMIN_USERNAME in recent_writes
+
+@pytest.fixture
+def member(client, auth_headers, plan, request):
+    response = client.post("/api/members/", json={
+        "first_name": "Beto", "last_name": "Bulk", "dni": request.node.name, "email": f"{request.node.name}@gym.test",
+        "membership_plan_id": plan["id"], "membership_start_date": "2026-10-01"
+    }, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+@pytest.fixture
+def payment_ids(client, auth_headers, member):
+    return [
+        client.post("/api/payments/", json={
+            "member_id": member["id"], "amount": "30.00", "payment_method": "cash", "payment_concept": "membership"
+        }, headers=auth_headers).json()["id"]
+        for _ in range(2)
+    ]
+
+@pytest.fixture
+def verified_payment_ids(client, auth_headers, payment_ids):
+    for payment_id in payment_ids:
+        client.put(f"/api/payments/{payment_id}/verify", headers=auth_headers)
+    return payment_ids
+
+def test_bulk_verify_marks_recent_write(client, auth_headers, payment_ids, cold_auth_cache, recent_writes):
+    response = client.post("/api/payments/bulk-verify", json={"ids": payment_ids}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["updated_ids"] == payment_ids
+    assert ADMIN_USERNAME in recent_writes
+
+def test_bulk_unverify_marks_recent_write(client, auth_headers, verified_payment_ids, cold_auth_cache, recent_writes):
+    response = client.post("/api/payments/bulk-unverify", json={"ids": verified_payment_ids}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["updated_ids"] == verified_payment_ids
+    assert ADMIN_USERNAME in recent_writes
+
+def test_bulk_payments_mark_recent_write(client, auth_headers, member, cold_auth_cache, recent_writes):
+    items = [
+        {"member_id": member["id"], "amount": "15.00", "payment_method": "card", "payment_concept": "membership"},
+        {"member_id": member["id"], "amount": "-1"},
+    ]
+    response = client.post("/api/payments/bulk", json=items, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert (response.json()["created"], response.json()["failed"]) == (1, 1)
+    assert ADMIN_USERNAME in recent_writes
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Simular una réplica: registra cuántas sesiones se abren sobre ella"""
+    opened = []
+    def read_session():
+        opened.append(True)
+        return database.AsyncSessionLocal()
+    monkeypatch.setattr(database, "read_async_engine", object())
+    monkeypatch.setattr(database, "ReadSessionLocal", read_session)
+    monkeypatch.setattr(database, "_recent_writes", type(database._recent_writes)())
+    return opened
+
+def test_last_write_cookie_keeps_reads_on_primary_in_any_worker(client, auth_headers, member, replica):
+    client.cookies.clear()
+    response = client.put(f"/api/members/{member['id']}", json={"phone": "555"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert database.LAST_WRITE_COOKIE in response.cookies
+
+    # Otro worker: sin registro en memoria, solo el cookie
+    database._recent_writes.clear()
+    assert client.get("/api/members/", headers=auth_headers).status_code == 200
+    assert replica == []
+
+    client.cookies.clear()
+    assert client.get("/api/members/", headers=auth_headers).status_code == 200
+    assert replica == [True]
+
+def test_stickiness_is_keyed_by_user_not_token():
+    # Por ejemplo el token del login y el emitido luego por /refresh
+    tokens = [create_access_token({"sub": ADMIN_USERNAME}, timedelta(minutes=minutes)) for minutes in (15, 30)]
+    assert tokens[0] != tokens[1]
+    keys = {
+        database.client_key(Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]}))
+        for token in tokens
+    }
+    assert keys == {ADMIN_USERNAME}
+
+def test_check_in_marks_recent_write(client, auth_headers, member, recent_writes):
+    response = client.post("/api/attendance/check-in", json={"identifier": member["dni"]}, headers=auth_headers)
+    assert response.status_code == 201, response.text
+    assert ADMIN_USERNAME in recent_writes
@@ -1,7 +1,39 @@
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api'
 
+// Renovación compartida: si varias peticiones reciben 401 a la vez se hace un solo refresh
+let refreshPromise = null
+
+// Obtener un nuevo access token usando el refresh token (sin volver a pedir la contraseña)
+export const refreshAccessToken = async () => {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) return null
+
+  if (!refreshPromise) {
+    refreshPromise = fetch(`${API_BASE_URL}/auth/refresh`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken })
+    })
+      .then(async (response) => {
+        if (!response.ok) {
+          localStorage.removeItem('refresh_token')
+          return null
+        }
+        const data = await response.json()
+        localStorage.setItem('access_token', data.access_token)
+        localStorage.setItem('refresh_token', data.refresh_token)
+        return data.access_token
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshPromise = null
+      })
+  }
+  return refreshPromise
+}
+
 // Función helper para hacer peticiones autenticadas
-export const authenticatedFetch = async (url, options = {}) => {
+export const authenticatedFetch = async (url, options = {}, retry = true) => {
   const token = localStorage.getItem('access_token')
   
   const config = {
@@ -15,8 +47,12 @@ export const authenticatedFetch = async (url, options = {}) => {
   
   const response = await fetch(`${API_BASE_URL}${url}`, config)
   
-  // Si el token expiró, limpiar el storage y permitir que el AuthContext maneje el logout
   if (response.status === 401) {
+    // Intentar renovar el access token una vez antes de dar la sesión por terminada
+    if (retry && await refreshAccessToken()) {
+      return authenticatedFetch(url, options, false)
+    }
+    // Si el token expiró, limpiar el storage y permitir que el AuthContext maneje el logout
     localStorage.removeItem('access_token')
     // No hacer redirect directo, dejar que la aplicación lo maneje
     return null
@@ -59,6 +59,7 @@ export const AuthProvider = ({ children }) => {
         setUser({ email: email, name: 'Administrador' })
         setIsAuthenticated(true)
         localStorage.setItem('access_token', data.access_token)
+        localStorage.setItem('refresh_token', data.refresh_token)
         return { success: true }
       } else {
         const errorData = await response.json()
@@ -73,9 +74,19 @@ export const AuthProvider = ({ children }) => {
   }
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refresh_token')
+    if (refreshToken) {
+      // Revocar el refresh token en el servidor (no bloquea el logout local)
+      fetch(`${API_BASE_URL}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+      }).catch(() => {})
+    }
     setUser(null)
     setIsAuthenticated(false)
     localStorage.removeItem('access_token')
+    localStorage.removeItem('refresh_token')
   }
 
   const value = {
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { refreshAccessToken } from '../config/api';
 
 // Configuración base de la API
 const API_BASE_URL = 'http://localhost:8000/api';
@@ -6,6 +7,8 @@ const API_BASE_URL = 'http://localhost:8000/api';
 // Crear instancia de axios con configuración base
 const api = axios.create({
   baseURL: API_BASE_URL,
+  // Enviar el cookie de última escritura (lecturas del primario justo después de escribir)
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -23,8 +26,18 @@ api.interceptors.request.use((config) => {
 // Interceptor para manejar respuestas y errores
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
     if (error.response?.status === 401) {
+      const originalRequest = error.config;
+      // Renovar el access token una sola vez y reintentar la petición
+      if (!originalRequest._retried) {
+        originalRequest._retried = true;
+        const newToken = await refreshAccessToken();
+        if (newToken) {
+          originalRequest.headers.Authorization = `Bearer ${newToken}`;
+          return api(originalRequest);
+        }
+      }
       // Token expirado o inválido
       localStorage.removeItem('access_token');
       window.location.href = '/login';
@@ -46,8 +59,9 @@ export const authService = {
       },
     });
     
-    const { access_token } = response.data;
+    const { access_token, refresh_token } = response.data;
     localStorage.setItem('access_token', access_token);
+    localStorage.setItem('refresh_token', refresh_token);
     return response.data;
   },
 
@@ -58,6 +72,7 @@ export const authService = {
 
   logout() {
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
     window.location.href = '/login';
   },
 